@@ -0,0 +1,259 @@
+"""Ark - Async Database Session Management."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+from inspect import isasyncgenfunction
+from typing import IO, Any, AsyncIterator, Callable, Dict, Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy.pool import NullPool
+
+from ark import database
+from ark.settings import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+_async_engines: Dict[str, AsyncEngine] = {}
+_async_session_factories: Dict[str, Callable[[], AsyncSession]] = {}
+
+
+def get_async_url(db_url: str) -> str:
+    """
+    Get the async driver URL for a database URL.
+
+    Args:
+        db_url (str): The database URL. Example: 'sqlite:///ark.db'.
+
+    Raises:
+        ValueError: If no async driver is known for the database backend.
+
+    Returns:
+        str: The async database URL. Example: 'sqlite+aiosqlite:///ark.db'.
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for database: '{backend}'")
+    if url.get_driver_name() == ASYNC_DRIVERS[backend]:
+        return db_url
+    async_url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return async_url.render_as_string(hide_password=False)
+
+
+def get_async_engine(db_url: Optional[str] = None) -> AsyncEngine:
+    """
+    Get the shared async engine for a database URL, creating it on first
+    use.
+
+    Uses the same pool options and engine hooks as get_engine, except for
+    SQLite files: aiosqlite runs every connection in a non-daemon thread,
+    so a pooled connection would keep the process from exiting. SQLite
+    connections are opened per session instead.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Raises:
+        ModuleNotFoundError: The async database driver is not installed.
+
+    Returns:
+        AsyncEngine: The async database engine.
+    """
+    db_url = db_url or config.DB_URL
+    engine = _async_engines.get(db_url)
+    if engine is not None:
+        return engine
+
+    engine_options = database.get_engine_options(db_url)
+    if database.get_sqlite_path(db_url) is not None:
+        engine_options = {
+            "poolclass": NullPool,
+            "connect_args": engine_options.get("connect_args", {}),
+        }
+    logger.debug("Creating async database engine.")
+    try:
+        engine = create_async_engine(get_async_url(db_url), **engine_options)
+    except ModuleNotFoundError as import_error:
+        logger.critical(
+            "Async database driver not installed: '%s'. "
+            "Install Ark with the 'async' extra.",
+            import_error.name,
+        )
+        raise
+    database.apply_engine_hooks(engine.sync_engine)
+    _async_engines[db_url] = engine
+    _async_session_factories[db_url] = partial(
+        AsyncSession, bind=engine, expire_on_commit=False
+    )
+    return engine
+
+
+async def dispose_async_engines() -> None:
+    """Dispose all async engines and their connection pools."""
+    for engine in list(_async_engines.values()):
+        logger.debug("Disposing async database engine: '%s'", engine.url)
+        await engine.dispose()
+    _async_engines.clear()
+    _async_session_factories.clear()
+
+
+@asynccontextmanager
+async def async_session_scope(
+    db_url: Optional[str] = None,
+) -> AsyncIterator[AsyncSession]:
+    """
+    Provide an async session from the shared async engine for a URL.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Yields:
+        AsyncIterator[AsyncSession]: The async database session.
+    """
+    db_url = db_url or config.DB_URL
+    get_async_engine(db_url)
+    async with _async_session_factories[db_url]() as session:
+        yield session
+
+
+@asynccontextmanager
+async def async_writer_lock(
+    db_url: Optional[str] = None,
+) -> AsyncIterator[None]:
+    """
+    Serialize database writers without blocking the event loop.
+
+    Uses the same lock file as writer_lock, so async writers queue behind
+    sync writers in this and other processes.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Yields:
+        AsyncIterator[None]: Nothing. The lock is held inside the context.
+    """
+    db_url = db_url or config.DB_URL
+    db_path = database.get_sqlite_path(db_url)
+    if not config.DB_SINGLE_WRITER or db_path is None or fcntl is None:
+        yield
+        return
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # pylint: disable-next=consider-using-with
+    lock = open(f"{db_path}.lock", "a", encoding=config.ENCODING)
+    logger.debug("Waiting for writer lock: '%s.lock'", db_path)
+    acquire = asyncio.ensure_future(
+        asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+    )
+    try:
+        await asyncio.shield(acquire)
+    except BaseException:
+        # A cancelled wait does not stop the thread, which still takes the
+        # lock. Release it as soon as the thread is done.
+        acquire.add_done_callback(lambda _: release_lock_file(lock))
+        raise
+    try:
+        yield
+    finally:
+        release_lock_file(lock)
+
+
+def release_lock_file(lock: IO[str]) -> None:
+    """
+    Release a writer lock and close its lock file.
+
+    Args:
+        lock (IO[str]): The open lock file.
+    """
+    fcntl.flock(lock, fcntl.LOCK_UN)
+    lock.close()
+
+
+def get_async_session(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Create an async database session and pass it to the coroutine or async
+    generator function.
+
+    Args:
+        func (Callable[..., Any]): The function to wrap.
+
+    Returns:
+        Callable[..., Any]: The wrapped function.
+    """
+    if isasyncgenfunction(func):
+
+        @wraps(func)
+        async def generator_session_manager(
+            *args: Any, **kwargs: Any
+        ) -> AsyncIterator[Any]:
+            """
+            Keep the session open until the async generator is exhausted.
+
+            Yields:
+                AsyncIterator[Any]: The generator values.
+            """
+            async with async_session_scope() as session:
+                async for item in func(*args, session=session, **kwargs):
+                    yield item
+
+        return generator_session_manager
+
+    @wraps(func)
+    async def session_manager(*args: Any, **kwargs: Any) -> Any:
+        """
+        Create an async database session and pass it to the function.
+
+        Returns:
+            Any: The function return value.
+        """
+        async with async_session_scope() as session:
+            return await func(*args, session=session, **kwargs)
+
+    return session_manager
+
+
+def get_async_write_session(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Create an async database session for a coroutine function that writes
+    to the database.
+
+    Same as get_async_session, but the call holds the writer lock.
+
+    Args:
+        func (Callable[..., Any]): The function to wrap.
+
+    Returns:
+        Callable[..., Any]: The wrapped function.
+    """
+    session_func = get_async_session(func)
+
+    @wraps(func)
+    async def write_session_manager(*args: Any, **kwargs: Any) -> Any:
+        """
+        Hold the writer lock while the function runs.
+
+        Returns:
+            Any: The function return value.
+        """
+        async with async_writer_lock():
+            return await session_func(*args, **kwargs)
+
+    return write_session_manager
@@ -0,0 +1,172 @@
+"""Ark - Database Commands."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import logging
+
+import click
+from tabulate import tabulate
+
+from ark import migrations
+from ark.core import maintenance
+from ark.database import get_engine, upgrade_db
+from ark.settings import config
+from ark.utils import format_size
+
+from .utilities import log_command_call
+
+logger = logging.getLogger(__name__)
+
+
+@click.group("db")
+def db_group() -> None:
+    """Database operations."""
+
+
+@db_group.command("status")
+@log_command_call()
+def show_schema_status() -> None:
+    """Show the database schema version and pending migrations."""
+    engine = get_engine()
+    version = migrations.get_schema_version(engine)
+    click.echo(
+        f"Schema version: {'unknown' if version is None else version} "
+        f"(latest: {migrations.LATEST_VERSION})"
+    )
+    pending_migrations = migrations.get_pending_migrations(engine)
+    if not pending_migrations:
+        click.echo("Database is up to date.")
+        return
+    click.echo("Pending migrations:")
+    for migration in pending_migrations:
+        click.echo(f"  {migration.version}: {migration.description}")
+
+
+@db_group.command("upgrade")
+@log_command_call()
+def upgrade_schema() -> None:
+    """Apply pending database schema migrations."""
+    applied_migrations = upgrade_db()
+    if not applied_migrations:
+        click.echo("Database is up to date.")
+        return
+    for migration in applied_migrations:
+        click.echo(f"Applied {migration.version}: {migration.description}")
+    click.echo(f"Schema version: {migrations.LATEST_VERSION}")
+
+
+@db_group.command("maintain")
+@click.option(
+    "--quick-check",
+    is_flag=True,
+    help="Run the faster quick_check instead of a full integrity check.",
+)
+@click.option(
+    "--full-vacuum",
+    is_flag=True,
+    help="Rebuild the database once to enable incremental vacuuming.",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Number of largest fact blobs to show.",
+)
+@click.pass_context
+@log_command_call()
+def maintain_database(
+    ctx: click.Context, quick_check: bool, full_vacuum: bool, top: int
+) -> None:
+    """
+    Check, analyze, vacuum and checkpoint the database, then show its size
+    statistics. Safe to run from cron while the database is in use.
+
+    Args:
+        ctx (click.Context): Click context.
+        quick_check (bool): Run the faster integrity check.
+        full_vacuum (bool): Rebuild the database with a full VACUUM.
+        top (int): Number of largest fact blobs to show.
+    """
+    result = maintenance.maintain_database(
+        quick_check=quick_check, full_vacuum=full_vacuum
+    )
+    if result.integrity_errors:
+        click.echo("Integrity check failed, maintenance skipped:")
+        for message in result.integrity_errors:
+            click.echo(f"  {message}")
+        ctx.exit(1)
+    if result.integrity_errors is not None:
+        click.echo("Integrity check: ok")
+    if result.analyzed:
+        click.echo("Analyze: done")
+    if result.vacuum_skipped:
+        click.echo(
+            "Vacuum: skipped, the database does not use incremental "
+            "auto-vacuum. Run with --full-vacuum once to enable it."
+        )
+    elif result.freed_pages is not None:
+        click.echo(f"Vacuum: {result.freed_pages} page(s) freed")
+    if result.checkpoint is not None:
+        busy, log_pages, checkpointed_pages = result.checkpoint
+        click.echo(
+            f"WAL checkpoint: {checkpointed_pages}/{log_pages} page(s)"
+            f"{' (busy, readers active)' if busy else ''}"
+        )
+    click.echo()
+    display_database_stats(maintenance.get_database_stats(top=top))
+
+
+def display_database_stats(stats: maintenance.DatabaseStats) -> None:
+    """
+    Display database size statistics.
+
+    Args:
+        stats (maintenance.DatabaseStats): The database statistics.
+    """
+    if stats.size is not None:
+        click.echo(
+            f"Database size: {format_size(stats.size)} "
+            f"({stats.page_count} pages of {stats.page_size} bytes)"
+        )
+    if stats.free_ratio is not None:
+        click.echo(
+            f"Free pages: {stats.freelist_count} ({stats.free_ratio:.1%})"
+        )
+    if stats.auto_vacuum is not None:
+        click.echo(f"Auto-vacuum: {stats.auto_vacuum}")
+
+    table_data = [
+        (
+            item.name,
+            item.kind,
+            "-" if item.rows is None else item.rows,
+            "-" if item.size is None else format_size(item.size),
+            (
+                "-"
+                if item.fragmentation is None
+                else f"{item.fragmentation:.1%}"
+            ),
+        )
+        for item in stats.objects
+    ]
+    click.echo()
+    click.echo(
+        tabulate(
+            table_data,
+            headers=["Name", "Type", "Rows", "Size", "Unused"],
+            tablefmt=config.TABLE_FORMAT,
+        )
+    )
+
+    if stats.largest_facts:
+        click.echo()
+        click.echo(
+            tabulate(
+                [
+                    (fqdn, format_size(size))
+                    for fqdn, size in stats.largest_facts
+                ],
+                headers=["Largest Facts", "Size"],
+                tablefmt=config.TABLE_FORMAT,
+            )
+        )
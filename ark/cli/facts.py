@@ -3,6 +3,8 @@ __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
 import json
 import logging
+import tarfile
+import zipfile
 from pathlib import Path
 from typing import Any, Optional
 
@@ -12,9 +14,13 @@ from tabulate import tabulate
 from ark.core import facts
 from ark.models.facts import AnsibleHostFacts
 from ark.settings import config
-from ark.utils import validate_project_dir
+from ark.utils import parse_duration, validate_project_dir
 
-from .utilities import echo_or_page, log_command_call
+from .utilities import (
+    echo_or_page,
+    log_command_call,
+    project_name_validation_callback,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,15 +37,48 @@ def facts_group() -> None:
     default=None,
     required=False,
 )
+@click.option(
+    "--archive",
+    "archives",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Import fact caches from a tar or zip archive. Repeatable.",
+)
 @log_command_call()
-def import_fact_caches(project_name: Optional[str]) -> None:
+def import_fact_caches(
+    project_name: Optional[str], archives: tuple[Path, ...]
+) -> None:
     """
     Collect Ansible facts for all hosts in a project. If no project is
     specified, all projects will be imported.
 
     Args:
         project_name (Optional[str]): Project name.
+        archives (tuple[Path, ...]): Fact cache archives to import instead.
     """
+    if archives and project_name:
+        raise click.UsageError("--archive cannot be used with PROJECT_NAME.")
+    if archives:
+        for archive_path in archives:
+            if not facts.is_fact_archive(archive_path):
+                click.echo(f"'{archive_path}' is not a supported archive.")
+                continue
+            try:
+                archive_hosts = facts.recursive_import(archive_path)
+            except (tarfile.TarError, zipfile.BadZipFile) as archive_error:
+                raise click.ClickException(
+                    f"Could not read archive '{archive_path}': {archive_error}"
+                ) from archive_error
+            if not archive_hosts:
+                click.echo(
+                    f"No new or modified facts found in '{archive_path}'."
+                )
+                continue
+            click.echo(f"Collected facts from {archive_path}:")
+            for hostname in archive_hosts:
+                click.echo(f"  {hostname}")
+        return
+
     project_path = (
         Path(config.PROJECTS_DIR) / project_name
         if project_name
@@ -69,6 +108,39 @@ def import_fact_caches(project_name: Optional[str]) -> None:
     )
 
 
+@facts_group.command("cache-plugin")
+@click.argument(
+    "project_name",
+    type=click.Path(exists=False),
+    callback=project_name_validation_callback,
+)
+@click.option(
+    "--disable", is_flag=True, help="Disable the Ark fact cache plugin."
+)
+@log_command_call()
+def configure_cache_plugin(project_name: str, disable: bool) -> None:
+    """
+    Store facts gathered during runs directly in the Ark database.
+
+    Enables the Ark Ansible fact cache plugin in the project's
+    'env/envvars'.
+
+    Args:
+        project_name (str): Project name.
+        disable (bool): Disable the Ark fact cache plugin.
+    """
+    changed = facts.configure_cache_plugin(project_name, enable=not disable)
+    state = "disabled" if disable else "enabled"
+    if changed:
+        click.echo(
+            f"Ark fact cache plugin {state} for project '{project_name}'."
+        )
+        return
+    click.echo(
+        f"Ark fact cache plugin already {state} for project '{project_name}'."
+    )
+
+
 @facts_group.command("query")
 @click.argument("fqdn")
 @click.argument("fact-key", default=None, required=False)
@@ -156,6 +228,117 @@ def find_hosts_by_fact(
     echo_or_page(output, page)
 
 
+@facts_group.command("changes")
+@click.option(
+    "--since",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Only show changes after this sequence number.",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of changes to show.",
+)
+@log_command_call()
+def show_fact_changes(since: int, limit: Optional[int]) -> None:
+    """
+    Stream fact changes as JSON lines.
+
+    Hosts removed by 'facts remove' or 'facts prune' are streamed with
+    "removed" set and no changed keys.
+
+    Args:
+        since (int): Only show changes after this sequence number.
+        limit (Optional[int]): Maximum number of changes to show.
+    """
+    change_count = 0
+    for change in facts.query_fact_changes(since=since, limit=limit):
+        click.echo(
+            json.dumps(
+                {
+                    "sequence": change.sequence,
+                    "fqdn": change.fqdn,
+                    "changed_keys": json.loads(change.changed_keys),
+                    "timestamp": change.timestamp.isoformat(),
+                    "removed": change.removed,
+                }
+            )
+        )
+        change_count += 1
+    logger.info("Streamed '%s' fact changes.", change_count)
+
+
+@facts_group.command("diff")
+@click.argument("fqdn")
+@click.argument("other-fqdn", default=None, required=False)
+@click.option(
+    "--previous",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Compare against the facts from this many imports ago.",
+)
+@click.option("--page", is_flag=True, help="Page the output.")
+@log_command_call()
+def diff_host_facts(
+    fqdn: str,
+    other_fqdn: Optional[str],
+    previous: Optional[int],
+    page: Optional[bool],
+) -> None:
+    """
+    Show the fact paths that differ between two hosts, or between a host
+    and one of its previous imports.
+
+    Args:
+        fqdn (str): Fully qualified domain name.
+        other_fqdn (Optional[str]): Fully qualified domain name to compare.
+        previous (Optional[int]): Compare against a previous import.
+        page (Optional[bool]): Page the output.
+    """
+    if bool(other_fqdn) == bool(previous):
+        click.echo("Please specify either another host or --previous.")
+        return
+
+    left_label = f"{fqdn} (-{previous})" if previous else fqdn
+    right_label = other_fqdn or fqdn
+    left_facts = facts.get_host_facts(fqdn, previous=previous or 0)
+    right_facts = facts.get_host_facts(right_label)
+    if left_facts is None or right_facts is None:
+        missing_label = left_label if left_facts is None else right_label
+        click.echo(f"No facts found for {missing_label}.")
+        return
+
+    table_data = [
+        (
+            difference.path,
+            difference.change,
+            ""
+            if difference.change == "added"
+            else json.dumps(difference.left),
+            ""
+            if difference.change == "removed"
+            else json.dumps(difference.right),
+        )
+        for difference in facts.diff_facts(left_facts, right_facts)
+    ]
+    if not table_data:
+        click.echo(f"No differences between {left_label} and {right_label}.")
+        return
+    table = tabulate(
+        table_data,
+        headers=["Path", "Change", left_label, right_label],
+        tablefmt=config.TABLE_FORMAT,
+        maxcolwidths=[50, None, 60, 60],
+        colalign=["left", "left", "left", "left"],
+    )
+    echo_or_page(
+        f"Fact differences between {left_label} and {right_label}:\n{table}",
+        page,
+    )
+
+
 @facts_group.command("remove")
 @click.argument("fqdn")
 @log_command_call()
@@ -174,6 +357,44 @@ def remove_host_from_db(fqdn: str) -> None:
         click.echo(f"Host '{fqdn}' not found in the database.")
 
 
+@facts_group.command("prune")
+@click.option(
+    "--older-than",
+    required=True,
+    type=str,
+    help="Remove hosts not seen in an import for this long. Example: 30d",
+)
+@click.option(
+    "--dry-run", is_flag=True, help="Only show the hosts to be removed."
+)
+@log_command_call()
+def prune_stale_hosts(older_than: str, dry_run: bool) -> None:
+    """
+    Remove all hosts that have not been seen in an import for a while.
+
+    Args:
+        older_than (str): Duration such as '12h', '30d' or '8w'.
+        dry_run (bool): Only show the hosts to be removed.
+    """
+    try:
+        max_age = parse_duration(older_than)
+    except ValueError as value_error:
+        raise click.BadParameter(
+            str(value_error), param_hint="'--older-than'"
+        ) from value_error
+
+    stale_hosts = facts.prune_hosts(max_age, dry_run=dry_run)
+    if not stale_hosts:
+        click.echo(f"No hosts older than {older_than} found.")
+        return
+    click.echo(
+        f"{'Would remove' if dry_run else 'Removed'} "
+        f"{len(stale_hosts)} host(s) not seen in {older_than}:"
+    )
+    for fqdn in stale_hosts:
+        click.echo(f"  {fqdn}")
+
+
 @facts_group.command("show-hosts")
 @click.option("--page", is_flag=True, help="Page the output.")
 @log_command_call()
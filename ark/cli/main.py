@@ -5,23 +5,37 @@ __author__ = "Anthony Pagan <get-tony@outlook.com>"
 import click
 
 from .cron import cron_group
+from .db import db_group
 from .facts import facts_group
 from .inventory import inventory_group
 from .lint import lint_command
-from .report import report_command
-from .run import run_command
+from .report import report_group
+from .run import run_group, run_many_command
+from .utilities import require_current_schema
 
 
 @click.group()
 @click.version_option()
-def ark_cli() -> None:
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="Show SQL statement, row and timing statistics after the command.",
+)
+@click.pass_context
+def ark_cli(
+    ctx: click.Context, stats: bool  # pylint: disable=unused-argument
+) -> None:
     """Ark - Streamline Your Ansible Workflow."""
+    if ctx.invoked_subcommand != "db":
+        require_current_schema()
 
 
 # Add subcommands
-ark_cli.add_command(run_command)
+ark_cli.add_command(run_group)
+ark_cli.add_command(run_many_command)
 ark_cli.add_command(lint_command)
-ark_cli.add_command(report_command)
+ark_cli.add_command(report_group)
 ark_cli.add_command(facts_group)
 ark_cli.add_command(inventory_group)
 ark_cli.add_command(cron_group)
+ark_cli.add_command(db_group)
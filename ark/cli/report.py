@@ -1,47 +1,52 @@
 """Ark - Reporting Commands."""
 __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
+import csv
+import json
 import logging
-from pathlib import Path
-from typing import Optional
+import sys
+from typing import Iterable, List, Optional, TextIO, Tuple
 
 import click
 from tabulate import tabulate
 
-from ark.core import report
+from ark.core import progress, report
 from ark.settings import config
-from ark.utils import read_file_contents
 
-from .utilities import log_command_call, project_name_validation_callback
+from .utilities import (
+    DefaultCommandGroup,
+    ProgressDisplay,
+    log_command_call,
+    project_name_validation_callback,
+)
 
 logger = logging.getLogger(__name__)
 
+OUTPUT_FORMATS = ("table", "json", "ndjson", "csv")
+
 
-def display_artifact_report(artifact_path: Path) -> None:
+def display_artifact_report(
+    artifact: report.ArtifactRecap, title: Optional[str] = None
+) -> None:
     """
     Display a report for a given artifact.
 
     Args:
-        artifact_path (Path): Path to the artifact.
+        artifact (report.ArtifactRecap): The parsed artifact.
+        title (Optional[str], optional): What the report is for.
+            Defaults to the artifact path.
     """
-    stdout_path: Path = artifact_path / "stdout"
-
-    content = read_file_contents(stdout_path) or ""
+    timestamp = artifact.timestamp.strftime("%Y-%m-%d %H:%M:%S")
 
-    play_recaps = report.extract_play_recaps(content)
-    timestamp = report.get_artifact_timestamp(stdout_path)
-    playbook_name = report.extract_playbook_name_from_file(
-        str(artifact_path / "command")
-    )
-
-    click.echo(f"Report for {artifact_path}:")
-    click.echo(f"{playbook_name or 'Playbook'} completed at: {timestamp}")
+    click.echo(f"Report for {title or artifact.path}:")
+    click.echo(f"{artifact.playbook or 'Playbook'} completed at: {timestamp}")
+    if artifact.status:
+        click.echo(f"Status: {artifact.status} (return code: {artifact.rc})")
 
     headers = ["Host", "ok", "changed", "unreachable", "failed", "skipped"]
     rows = []
 
-    for recap in play_recaps:
-        host_stats = report.extract_host_stats(recap)
+    for host_stats in artifact.recaps:
         for host, stats in host_stats.items():
             row = [
                 host,
@@ -58,38 +63,385 @@ def display_artifact_report(artifact_path: Path) -> None:
     click.echo("")
 
 
-@click.command("report")
+def display_fleet_report(host_recaps: List[report.HostRecap]) -> None:
+    """
+    Display one table with the host recaps of many projects.
+
+    Args:
+        host_recaps (List[report.HostRecap]): The host recaps to display.
+    """
+    headers = [
+        "Project",
+        "Host",
+        "Playbook",
+        "Completed",
+        "ok",
+        "changed",
+        "unreachable",
+        "failed",
+        "skipped",
+    ]
+    rows = [
+        [
+            host_recap.project,
+            host_recap.host,
+            host_recap.playbook or "-",
+            host_recap.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            host_recap.stats.get("ok", 0),
+            host_recap.stats.get("changed", 0),
+            host_recap.stats.get("unreachable", 0),
+            host_recap.stats.get("failed", 0),
+            host_recap.stats.get("skipped", 0),
+        ]
+        for host_recap in host_recaps
+    ]
+    click.echo(tabulate(rows, headers=headers, tablefmt=config.TABLE_FORMAT))
+
+
+def write_records(
+    host_recaps: Iterable[report.HostRecap], output_format: str
+) -> int:
+    """
+    Write host recaps as machine-readable records while they are loaded.
+
+    Args:
+        host_recaps (Iterable[report.HostRecap]): The host recaps.
+        output_format (str): 'json', 'ndjson' or 'csv'.
+
+    Returns:
+        int: Number of written records.
+    """
+    stream: TextIO = sys.stdout
+    count = 0
+    if output_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=report.RECORD_FIELDS)
+        writer.writeheader()
+        for host_recap in host_recaps:
+            writer.writerow(host_recap.as_record())
+            count += 1
+    elif output_format == "ndjson":
+        for host_recap in host_recaps:
+            stream.write(json.dumps(host_recap.as_record()) + "\n")
+            count += 1
+    else:
+        # A JSON array, written one record at a time.
+        stream.write("[")
+        for host_recap in host_recaps:
+            stream.write(("," if count else "") + "\n")
+            stream.write(json.dumps(host_recap.as_record()))
+            count += 1
+        stream.write("\n]\n")
+    stream.flush()
+    return count
+
+
+def follow_artifact(project_name: str) -> None:
+    """
+    Show the progress of a project's newest run, then its report.
+
+    Args:
+        project_name (str): Name of the project.
+    """
+    newest = report.sort_and_limit_artifacts(
+        report.find_artifacts(project_name), 1
+    )
+    if not newest:
+        click.echo("No artifacts found.")
+        return
+    artifact_path = newest[0].path
+    click.echo(f"Following {artifact_path}")
+    display = ProgressDisplay(progress.ProgressTally())
+    try:
+        for event in progress.follow_job_events(artifact_path):
+            display.handle_event(event)
+    finally:
+        display.close()
+    display_artifact_report(report.parse_artifact(artifact_path))
+
+
+@click.group("report", cls=DefaultCommandGroup, default_command="show")
+def report_group() -> None:
+    """
+    Display reports based on Ansible Runner artifacts.
+
+    Runs 'show' when no subcommand is given, so 'ark report <project>'
+    shows the project's recaps. A project named like a subcommand must
+    follow it, as in 'ark report show diff'.
+    """
+
+
+@report_group.command("show")
 @click.argument(
     "project_name",
     type=click.Path(exists=False),
     callback=project_name_validation_callback,
+    required=False,
 )
 @click.option(
     "-l",
     "--last",
     type=int,
     default=None,
-    help="Display the last x reports.",
+    help=(
+        "Display the last x reports. "
+        "Per project with --all-projects, which defaults to 1."
+    ),
+)
+@click.option(
+    "--all-projects",
+    is_flag=True,
+    help="Display one fleet-wide table for all projects.",
+)
+@click.option(
+    "--sort",
+    "sort_by",
+    type=click.Choice(report.FLEET_SORT_KEYS),
+    default="time",
+    show_default=True,
+    help="Sort the --all-projects table by time or failure count.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="table",
+    show_default=True,
+    help=(
+        "Output format. Machine formats write one record per artifact and "
+        "host, in artifact order, as artifacts are loaded."
+    ),
+)
+@click.option(
+    "-f",
+    "--follow",
+    is_flag=True,
+    help=(
+        "Show a live per-host tally of the newest run until it ends, "
+        "then its report."
+    ),
 )
 @log_command_call()
-def report_command(project_name: str, last: Optional[int]) -> None:
+def show_report(  # pylint: disable=too-many-arguments
+    project_name: Optional[str],
+    last: Optional[int],
+    all_projects: bool,
+    sort_by: str,
+    output_format: str,
+    follow: bool,
+) -> None:
     """
     Display a report for a given project.
 
     Args:
-        project_name (str): Name of the project.
+        project_name (Optional[str]): Name of the project.
         last (Optional[int]): Display the last x reports.
+        all_projects (bool): Display a fleet-wide table for all projects.
+        sort_by (str): Sort order of the fleet-wide table.
+        output_format (str): Table or machine-readable output format.
+        follow (bool): Follow the newest run until it ends.
     """
-    artifact_folders = report.find_artifacts(project_name)
-    artifact_folders = report.sort_and_limit_artifacts(artifact_folders, last)
+    if all_projects == bool(project_name):
+        raise click.UsageError(
+            "Specify either a project name or --all-projects."
+        )
+    if follow:
+        if all_projects or output_format != "table":
+            raise click.UsageError(
+                "--follow cannot be used with --all-projects or --format."
+            )
+        follow_artifact(str(project_name))
+        return
+    if output_format != "table":
+        if all_projects:
+            artifact_folders = report.find_fleet_artifacts(
+                1 if last is None else last
+            )
+        else:
+            artifact_folders = {
+                str(project_name): report.sort_and_limit_artifacts(
+                    report.find_artifacts(str(project_name)), last
+                )
+            }
+        record_count = write_records(
+            report.iter_host_recaps(
+                report.iter_project_recaps(
+                    artifact_folders, parallel=all_projects
+                )
+            ),
+            output_format,
+        )
+        logger.info("Wrote '%s' report records.", record_count)
+        return
+    if all_projects:
+        artifact_folders = report.find_fleet_artifacts(
+            1 if last is None else last
+        )
+        if not any(artifact_folders.values()):
+            click.echo("No artifacts found.")
+            return
+        display_fleet_report(
+            report.merge_host_recaps(
+                report.load_project_recaps(artifact_folders, parallel=True),
+                sort_by=sort_by,
+            )
+        )
+        return
 
-    if not artifact_folders:
+    project_artifacts = report.sort_and_limit_artifacts(
+        report.find_artifacts(str(project_name)), last
+    )
+    if not project_artifacts:
         click.echo("No artifacts found.")
         return
-    for artifact_path in artifact_folders:
-        display_artifact_report(artifact_path)
+    for artifact in report.load_artifact_recaps(
+        str(project_name), project_artifacts
+    ):
+        display_artifact_report(artifact)
+
+
+def display_trends(trends: List[report.TrendStats], title: str) -> None:
+    """
+    Display a table of run outcome rates.
+
+    Args:
+        trends (List[report.TrendStats]): The trends to display.
+        title (str): Header of the name column.
+    """
+    daily = any(trend.day for trend in trends)
+    headers = [
+        title,
+        *(["Day"] if daily else []),
+        "Runs",
+        "Success",
+        "Failed",
+        "Unreachable",
+        "Changed",
+        "Changed/Run",
+    ]
+    rows = [
+        [
+            trend.name,
+            *([trend.day] if daily else []),
+            trend.runs,
+            f"{trend.success_rate:.0%}",
+            f"{trend.failed_rate:.0%}",
+            f"{trend.unreachable_rate:.0%}",
+            f"{trend.changed_rate:.0%}",
+            f"{trend.changed_per_run:.1f}",
+        ]
+        for trend in trends
+    ]
+    click.echo(tabulate(rows, headers=headers, tablefmt=config.TABLE_FORMAT))
+
+
+@report_group.command("trends")
+@click.argument(
+    "project_name",
+    type=click.Path(exists=False),
+    callback=project_name_validation_callback,
+)
+@click.option(
+    "--by",
+    "group_by",
+    type=click.Choice(report.TREND_GROUP_KEYS),
+    default=None,
+    help="Only show trends per host or per playbook.",
+)
+@click.option("--daily", is_flag=True, help="Show one row per day.")
+@log_command_call()
+def show_trends(
+    project_name: str, group_by: Optional[str], daily: bool
+) -> None:
+    """
+    Display success, failure and change rates across all artifacts.
+
+    Rates are shares of host runs, where each host in each recap is one
+    host run. Hosts and playbooks with the lowest success rate come first.
+
+    Args:
+        project_name (str): Name of the project.
+        group_by (Optional[str]): Only show trends per host or playbook.
+        daily (bool): Show one row per day.
+    """
+    artifact_folders = report.find_artifacts(project_name)
     if not artifact_folders:
         click.echo("No artifacts found.")
         return
-    for artifact_path in artifact_folders:
-        display_artifact_report(artifact_path)
+    artifacts = report.load_artifact_recaps(project_name, artifact_folders)
+    for trend_group in report.TREND_GROUP_KEYS:
+        if group_by and trend_group != group_by:
+            continue
+        trends = report.compute_trends(
+            artifacts, group_by=trend_group, daily=daily
+        )
+        display_trends(trends, title=trend_group.capitalize())
+        click.echo("")
+
+
+@report_group.command("diff")
+@click.argument(
+    "project_name",
+    type=click.Path(exists=False),
+    callback=project_name_validation_callback,
+)
+@click.argument("artifact_ids", nargs=-1)
+@log_command_call()
+def show_diff(project_name: str, artifact_ids: Tuple[str, ...]) -> None:
+    """
+    Display the hosts whose status changed between two runs.
+
+    Compares two artifacts, given by run id or path, or by default the
+    newest run and the previous run of the same playbook. Statuses are
+    ok, failed and unreachable; '-' means the host was not in the run.
+
+    Args:
+        project_name (str): Name of the project.
+        artifact_ids (Tuple[str, ...]): The earlier and later artifact.
+    """
+    if len(artifact_ids) not in (0, 2):
+        raise click.UsageError("Specify two artifacts or none.")
+    artifact_folders = report.sort_and_limit_artifacts(
+        report.find_artifacts(project_name), None
+    )
+    if artifact_ids:
+        selected_folders = []
+        for artifact_id in artifact_ids:
+            folder = report.find_artifact(artifact_folders, artifact_id)
+            if folder is None:
+                raise click.BadParameter(
+                    f"Artifact not found: '{artifact_id}'",
+                    param_hint="'ARTIFACT_IDS'",
+                )
+            selected_folders.append(folder)
+        before, after = report.load_artifact_recaps(
+            project_name, selected_folders
+        )
+    else:
+        runs = report.find_previous_run(
+            report.load_artifact_recaps(project_name, artifact_folders)
+        )
+        if runs is None:
+            click.echo("No two runs of the same playbook found.")
+            return
+        before, after = runs
+
+    for label, artifact in (("Before", before), ("After", after)):
+        timestamp = artifact.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        click.echo(
+            f"{label}: {artifact.run_id} "
+            f"({artifact.playbook or 'Playbook'} completed at: {timestamp})"
+        )
+    changed_hosts = report.diff_host_outcomes(before, after)
+    if not changed_hosts:
+        click.echo("No host status changes.")
+        return
+    click.echo(
+        tabulate(
+            [
+                (host, before_outcome or "-", after_outcome or "-")
+                for host, before_outcome, after_outcome in changed_hosts
+            ],
+            headers=["Host", "Before", "After"],
+            tablefmt=config.TABLE_FORMAT,
+        )
+    )
@@ -2,19 +2,40 @@
 __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
 import logging
+import time
 from pathlib import Path
+from typing import List, Optional
 
 import click
+from tabulate import tabulate
 
-from ark.core import run
+from ark.core import inventory, profile, report, run
+from ark.core.progress import ProgressTally
 from ark.settings import config
 
-from .utilities import log_command_call, project_name_validation_callback
+from .report import display_artifact_report
+from .utilities import (
+    DefaultCommandGroup,
+    ProgressDisplay,
+    log_command_call,
+    project_name_validation_callback,
+)
 
 logger = logging.getLogger(__name__)
 
 
-@click.command("run")
+@click.group("run", cls=DefaultCommandGroup, default_command="playbook")
+def run_group() -> None:
+    """
+    Run Ansible playbooks and profile past runs.
+
+    Runs 'playbook' when no subcommand is given, so
+    'ark run <project> <playbook>' runs a playbook. A project named like a
+    subcommand must follow it, as in 'ark run playbook profile site.yml'.
+    """
+
+
+@run_group.command("playbook")
 @click.argument(
     "project_name",
     type=click.Path(exists=False),
@@ -46,6 +67,37 @@ logger = logging.getLogger(__name__)
     type=int,
     help="Increase the verbosity of the output.",
 )
+@click.option(
+    "--shards",
+    default=1,
+    type=click.IntRange(1),
+    help=(
+        "Split the hosts into this many groups and run them as parallel "
+        "jobs, each with its own artifact, then show one merged report."
+    ),
+)
+@click.option(
+    "--retry-failed",
+    is_flag=True,
+    help=(
+        "Only run the hosts that failed or were unreachable in the last "
+        "run of the playbook."
+    ),
+)
+@click.option(
+    "--from",
+    "from_artifact",
+    default=None,
+    help="Run id or path of the artifact to take --retry-failed hosts from.",
+)
+@click.option(
+    "--progress",
+    is_flag=True,
+    help=(
+        "Show a live per-host tally instead of the playbook output, "
+        "then the recap table."
+    ),
+)
 @log_command_call()
 def run_command(  # pylint: disable=too-many-arguments
     project_name: str,
@@ -54,6 +106,10 @@ def run_command(  # pylint: disable=too-many-arguments
     limit: str,
     extra_vars: str,
     verbosity: int,
+    shards: int,
+    retry_failed: bool,
+    from_artifact: Optional[str],
+    progress: bool,
 ) -> None:
     """
     Run an Ansible playbook.
@@ -64,7 +120,17 @@ def run_command(  # pylint: disable=too-many-arguments
         limit (str): Limit the playbook execution to a specific group or host.
         extra_vars (str): Pass additional variables as key-value pairs.
         verbosity (int): Increase the verbosity of the output.
+        shards (int): Number of parallel jobs to split the hosts into.
+        retry_failed (bool): Only run the failed and unreachable hosts of
+            the last run.
+        from_artifact (Optional[str]): Artifact to take the failed hosts
+            from.
+        progress (bool): Show a live per-host tally.
     """
+    if shards > 1 and progress:
+        raise click.UsageError("--progress cannot be used with --shards.")
+    if from_artifact and not retry_failed:
+        raise click.UsageError("--from can only be used with --retry-failed.")
     if not playbook_file:
         click.echo("Please specify a playbook to run.")
         click.echo(f"Available playbooks for the '{project_name}' project:")
@@ -86,18 +152,505 @@ def run_command(  # pylint: disable=too-many-arguments
             click.echo(f" - {playbook}")
         return
     extra_vars_dict = run.prepare_extra_vars(extra_vars)
-    click.echo(f"Running playbook: {playbook_path}")
-    play_results = run.run_ansible_playbook(
-        project_name=project_name,
-        playbook_path=playbook_path,
-        rotate_artifacts=rotate_artifacts,
-        limit=limit,
-        extra_vars_dict=extra_vars_dict,
-        verbosity=verbosity,
+    hosts = None
+    if retry_failed:
+        hosts = get_retry_hosts(
+            project_name, playbook_path.name, from_artifact, limit
+        )
+        if not hosts:
+            return
+    if shards > 1:
+        run_sharded_playbook(
+            project_name,
+            playbook_path,
+            shards,
+            rotate_artifacts,
+            hosts
+            or [
+                host.name
+                for host in inventory.get_project_hosts(
+                    project_name, limit or None
+                )
+            ],
+            extra_vars_dict,
+        )
+        return
+    if hosts:
+        with run.host_limit_files([hosts]) as (retry_limit,):
+            run_single_playbook(
+                project_name,
+                playbook_path,
+                rotate_artifacts,
+                retry_limit,
+                extra_vars_dict,
+                verbosity,
+                progress,
+            )
+        return
+    run_single_playbook(
+        project_name,
+        playbook_path,
+        rotate_artifacts,
+        limit,
+        extra_vars_dict,
+        verbosity,
+        progress,
     )
+
+
+def run_single_playbook(  # pylint: disable=too-many-arguments
+    project_name: str,
+    playbook_path: Path,
+    rotate_artifacts: int,
+    limit: str,
+    extra_vars_dict: dict[str, str],
+    verbosity: int,
+    progress: bool,
+) -> None:
+    """
+    Run a playbook as one runner job.
+
+    Args:
+        project_name (str): Name of the project.
+        playbook_path (Path): Path to the playbook.
+        rotate_artifacts (int): Number of artifacts to keep.
+        limit (str): Ansible limit.
+        extra_vars_dict (dict[str, str]): Extra vars.
+        verbosity (int): Ansible verbosity.
+        progress (bool): Show a live per-host tally.
+    """
+    click.echo(f"Running playbook: {playbook_path}")
+    display = ProgressDisplay(ProgressTally()) if progress else None
+    try:
+        play_results = run.run_ansible_playbook(
+            project_name=project_name,
+            playbook_path=playbook_path,
+            rotate_artifacts=rotate_artifacts,
+            limit=limit,
+            extra_vars_dict=extra_vars_dict,
+            verbosity=verbosity,
+            event_handler=display.handle_event if display else None,
+            quiet=progress,
+        )
+    finally:
+        if display:
+            display.close()
+    if play_results and display:
+        display_artifact_report(
+            report.parse_artifact(Path(play_results.config.artifact_dir))
+        )
     if play_results:
         click.echo(
             f"Playbook run completed with status: {play_results.status}"
         )
         return
     click.echo("Run returned no results.")
+
+
+def get_retry_hosts(
+    project_name: str,
+    playbook_name: str,
+    from_artifact: Optional[str],
+    limit: str,
+) -> List[str]:
+    """
+    Get the hosts that failed or were unreachable in a previous run.
+
+    Recaps come from the artifact index. If the last run of the playbook
+    was sharded, the failed hosts of all its shards are retried: its
+    artifacts are found by their shared limit folder and merged.
+
+    Args:
+        project_name (str): Name of the project.
+        playbook_name (str): Playbook filename. Without 'from_artifact', the
+            last run of this playbook is used.
+        from_artifact (Optional[str]): Run id or path of the artifact. Only
+            this artifact is used, even if it is one shard of a run.
+        limit (str): Only retry the hosts matching this limit.
+
+    Returns:
+        List[str]: The hosts to retry. Empty if there are none.
+    """
+    artifact_folders = report.sort_and_limit_artifacts(
+        report.find_artifacts(project_name), None
+    )
+    if from_artifact:
+        folder = report.find_artifact(artifact_folders, from_artifact)
+        if folder is None:
+            raise click.BadParameter(
+                f"Artifact not found: '{from_artifact}'", param_hint="'--from'"
+            )
+        artifact = report.load_artifact_recaps(project_name, [folder])[0]
+    else:
+        playbook_runs = [
+            artifact
+            for artifact in report.load_artifact_recaps(
+                project_name, artifact_folders
+            )
+            if artifact.playbook == playbook_name
+        ]
+        if not playbook_runs:
+            click.echo(f"No previous run of '{playbook_name}' found.")
+            return []
+        artifact = playbook_runs[0]
+        shard_group = run.get_shard_group(
+            report.read_artifact_limit(artifact.path)
+        )
+        if shard_group is not None:
+            artifact = report.merge_artifact_recaps(
+                [
+                    shard
+                    for shard in playbook_runs
+                    if run.get_shard_group(
+                        report.read_artifact_limit(shard.path)
+                    )
+                    == shard_group
+                ]
+            )
+
+    hosts = report.get_failed_hosts(artifact)
+    if limit and hosts:
+        limit_hosts = {
+            host.name
+            for host in inventory.get_project_hosts(project_name, limit)
+        }
+        hosts = [host for host in hosts if host in limit_hosts]
+    if not hosts:
+        click.echo(f"No failed or unreachable hosts in run {artifact.run_id}.")
+        return []
+    click.echo(
+        f"Retrying {len(hosts)} failed or unreachable host(s) "
+        f"from run {artifact.run_id}."
+    )
+    return hosts
+
+
+def run_sharded_playbook(  # pylint: disable=too-many-arguments
+    project_name: str,
+    playbook_path: Path,
+    shards: int,
+    rotate_artifacts: int,
+    hosts: List[str],
+    extra_vars_dict: dict[str, str],
+) -> None:
+    """
+    Run a playbook as parallel jobs over groups of hosts.
+
+    Args:
+        project_name (str): Name of the project.
+        playbook_path (Path): Path to the playbook.
+        shards (int): Number of host groups.
+        rotate_artifacts (int): Number of artifacts to keep.
+        hosts (List[str]): The hosts to split.
+        extra_vars_dict (dict[str, str]): Extra vars.
+    """
+    if not hosts:
+        click.echo(f"No hosts found in project '{project_name}'.")
+        return
+    host_groups = run.partition_hosts(hosts, shards)
+    click.echo(
+        f"Running playbook: {playbook_path} on {len(hosts)} host(s) "
+        f"in {len(host_groups)} shard(s)"
+    )
+
+    def echo_result(result: run.RunJobResult) -> None:
+        # The limit is the shard's limit file, named after the shard.
+        click.echo(
+            f"Finished {Path(result.job.limit.lstrip('@')).name}: "
+            f"{result.status} in {result.elapsed:.1f}s"
+        )
+
+    start_time = time.monotonic()
+    results = run.run_shards(
+        project_name,
+        playbook_path.name,
+        host_groups,
+        rotate_artifacts,
+        extra_vars_dict,
+        on_finish=echo_result,
+    )
+    click.echo("")
+    display_job_results(
+        results,
+        time.monotonic() - start_time,
+        limits=[
+            f"shard-{shard} ({len(group)} host(s))"
+            for shard, group in enumerate(host_groups, start=1)
+        ],
+    )
+    artifacts = [
+        report.parse_artifact(Path(result.artifact_dir))
+        for result in results
+        if result.artifact_dir
+        and (Path(result.artifact_dir) / "stdout").is_file()
+    ]
+    if not artifacts:
+        click.echo("Run returned no results.")
+        return
+    merged_artifact = report.merge_artifact_recaps(artifacts)
+    click.echo("")
+    display_artifact_report(
+        merged_artifact,
+        title=f"{len(artifacts)} shard(s) of {playbook_path.name}",
+    )
+    click.echo(
+        f"Playbook run completed with status: {merged_artifact.status}"
+    )
+
+
+def display_job_results(
+    results: List[run.RunJobResult],
+    elapsed: float,
+    limits: Optional[List[str]] = None,
+) -> None:
+    """
+    Display a summary table of concurrent playbook runs.
+
+    Args:
+        results (List[run.RunJobResult]): The job results.
+        elapsed (float): Total time of all runs in seconds.
+        limits (Optional[List[str]], optional): Descriptions of the job
+            limits to show. Defaults to the limits themselves.
+    """
+    rows = [
+        [
+            result.job.project,
+            result.job.playbook,
+            limits[index] if limits else result.job.limit or "-",
+            result.status,
+            "-" if result.rc is None else result.rc,
+            f"{result.elapsed:.1f}s",
+            Path(result.artifact_dir).name if result.artifact_dir else "-",
+        ]
+        for index, result in enumerate(results)
+    ]
+    click.echo(
+        tabulate(
+            rows,
+            headers=[
+                "Project",
+                "Playbook",
+                "Limit",
+                "Status",
+                "rc",
+                "Duration",
+                "Artifact",
+            ],
+            tablefmt=config.TABLE_FORMAT,
+        )
+    )
+    successful = sum(result.status == "successful" for result in results)
+    job_time = sum(result.elapsed for result in results)
+    click.echo(
+        f"{len(results)} job(s): {successful} successful, "
+        f"{len(results) - successful} not successful. "
+        f"Finished in {elapsed:.1f}s ({job_time:.1f}s of job time)."
+    )
+
+
+@click.command("run-many")
+@click.argument(
+    "manifest", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.option(
+    "-j",
+    "--max-jobs",
+    default=4,
+    show_default=True,
+    type=click.IntRange(1),
+    help="Maximum number of playbooks running at the same time.",
+)
+@click.option(
+    "--max-project-jobs",
+    default=1,
+    show_default=True,
+    type=click.IntRange(1),
+    help="Maximum number of playbooks running at the same time per project.",
+)
+@click.option(
+    "--rotate-artifacts",
+    default=7,
+    type=click.IntRange(1, 31),
+    help="Number of artifacts to keep.",
+)
+@click.pass_context
+@log_command_call()
+def run_many_command(
+    ctx: click.Context,
+    manifest: Path,
+    max_jobs: int,
+    max_project_jobs: int,
+    rotate_artifacts: int,
+) -> None:
+    """
+    Run the playbooks of a manifest concurrently.
+
+    The manifest is a YAML list of jobs, each with a 'project', a
+    'playbook' and optionally a 'limit' and 'extra_vars'. Exits with
+    status 1 if a job was not successful.
+
+    Args:
+        ctx (click.Context): Click context.
+        manifest (Path): Path to the manifest.
+        max_jobs (int): Maximum number of concurrent jobs.
+        max_project_jobs (int): Maximum number of concurrent jobs per
+            project.
+        rotate_artifacts (int): Number of artifacts to keep.
+    """
+    try:
+        jobs = run.load_run_manifest(manifest)
+    except ValueError as error:
+        raise click.BadParameter(
+            str(error), param_hint="'MANIFEST'"
+        ) from error
+    click.echo(f"Running {len(jobs)} job(s), up to {max_jobs} at a time.")
+
+    def echo_result(result: run.RunJobResult) -> None:
+        click.echo(
+            f"Finished {result.job.name}: {result.status} "
+            f"in {result.elapsed:.1f}s"
+        )
+
+    start_time = time.monotonic()
+    results = run.run_many(
+        jobs,
+        max_jobs=max_jobs,
+        max_project_jobs=max_project_jobs,
+        rotate_artifacts=rotate_artifacts,
+        on_finish=echo_result,
+    )
+    click.echo("")
+    display_job_results(results, time.monotonic() - start_time)
+    if any(result.status != "successful" for result in results):
+        ctx.exit(1)
+
+
+def display_run_profiles(run_profiles: List[profile.RunProfile]) -> None:
+    """
+    Display the timing of recorded runs.
+
+    Args:
+        run_profiles (List[profile.RunProfile]): The runs, newest first.
+    """
+    rows = [
+        [
+            run_profile.start.strftime("%Y-%m-%d %H:%M:%S"),
+            run_profile.run_id,
+            run_profile.playbook or "-",
+            run_profile.hosts,
+            run_profile.results,
+            f"{run_profile.wall_time:.1f}s",
+            f"{run_profile.task_time:.1f}s",
+        ]
+        for run_profile in run_profiles
+    ]
+    click.echo(
+        tabulate(
+            rows,
+            headers=[
+                "Started",
+                "Run",
+                "Playbook",
+                "Hosts",
+                "Results",
+                "Wall time",
+                "Task time",
+            ],
+            tablefmt=config.TABLE_FORMAT,
+        )
+    )
+
+
+@run_group.command("profile")
+@click.argument(
+    "project_name",
+    type=click.Path(exists=False),
+    callback=project_name_validation_callback,
+)
+@click.option(
+    "--run",
+    "run_id",
+    default=None,
+    help="Run id to profile. Defaults to the newest recorded run.",
+)
+@click.option(
+    "--top",
+    default=10,
+    show_default=True,
+    type=click.IntRange(1),
+    help="Number of tasks and hosts to show.",
+)
+@click.option(
+    "--runs",
+    default=10,
+    show_default=True,
+    type=click.IntRange(1),
+    help="Number of recent runs to show.",
+)
+@log_command_call()
+def profile_command(
+    project_name: str, run_id: Optional[str], top: int, runs: int
+) -> None:
+    """
+    Show the slowest tasks and hosts of a run and the time of recent runs.
+
+    Task results are recorded while Ark runs playbooks. Task wall time runs
+    from the first host starting a task to the last host finishing it.
+
+    Args:
+        project_name (str): Name of the project.
+        run_id (Optional[str]): Run id to profile.
+        top (int): Number of tasks and hosts to show.
+        runs (int): Number of recent runs to show.
+    """
+    run_profiles = profile.get_run_profiles(project_name, limit=runs)
+    if not run_profiles:
+        click.echo("No recorded runs found.")
+        return
+    run_id = run_id or run_profiles[0].run_id
+    task_profiles = profile.get_task_profiles(project_name, run_id, top=top)
+    if not task_profiles:
+        raise click.BadParameter(
+            f"No recorded run found: '{run_id}'", param_hint="'--run'"
+        )
+
+    click.echo(f"Slowest tasks of run {run_id}:")
+    click.echo(
+        tabulate(
+            [
+                [
+                    task_profile.task,
+                    task_profile.hosts,
+                    f"{task_profile.wall_time:.1f}s",
+                    f"{task_profile.average:.1f}s",
+                    f"{task_profile.longest:.1f}s",
+                ]
+                for task_profile in task_profiles
+            ],
+            headers=["Task", "Hosts", "Wall time", "Average", "Longest"],
+            tablefmt=config.TABLE_FORMAT,
+        )
+    )
+    click.echo("")
+    click.echo(f"Slowest hosts of run {run_id}:")
+    click.echo(
+        tabulate(
+            [
+                [
+                    host_profile.host,
+                    host_profile.tasks,
+                    f"{host_profile.total:.1f}s",
+                    f"{host_profile.longest:.1f}s",
+                    host_profile.failed,
+                ]
+                for host_profile in profile.get_host_profiles(
+                    project_name, run_id, top=top
+                )
+            ],
+            headers=["Host", "Tasks", "Task time", "Longest", "Failed"],
+            tablefmt=config.TABLE_FORMAT,
+        )
+    )
+    click.echo("")
+    click.echo("Recent runs:")
+    display_run_profiles(run_profiles)
@@ -3,13 +3,28 @@ __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
 import getpass
 import logging
+import shutil
+import sys
 import time
 from functools import wraps
 from pathlib import Path
-from typing import Any, Callable, List, Optional, TypeVar, Union, cast
+from typing import (
+    Any,
+    Callable,
+    List,
+    Optional,
+    TextIO,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import click
 
+from ark import migrations
+from ark.core.progress import ProgressTally
+from ark.database import get_engine
+from ark.instrumentation import query_stats
 from ark.settings import config
 from ark.utils import validate_project_dir
 
@@ -56,10 +71,22 @@ def log_command_call(log_level: str = "info") -> Callable[[T], T]:
             ]
             log_function("Parameters: {%s}", ", ".join(params))
 
+            show_stats = bool(ctx.find_root().params.get("stats"))
+            if show_stats:
+                query_stats.reset()
+                query_stats.enabled = True
+
             start_time = time.time()
-            result = func(*args, **kwargs)
-            end_time = time.time()
-            elapsed_time = end_time - start_time
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                end_time = time.time()
+                elapsed_time = end_time - start_time
+                if show_stats:
+                    query_stats.enabled = False
+                    summary = query_stats.summary(elapsed_time)
+                    logger.info("Command '%s' %s", command_name, summary)
+                    click.echo(summary, err=True)
 
             log_function("Command finished: %s", command_name)
             logger.debug(
@@ -74,6 +101,121 @@ def log_command_call(log_level: str = "info") -> Callable[[T], T]:
     return decorator
 
 
+class DefaultCommandGroup(click.Group):
+    """
+    Command group that runs a default command.
+
+    Arguments that do not start with a subcommand name are passed to the
+    default command, so 'ark report <project>' keeps working next to
+    subcommands such as 'ark report trends <project>'. Subcommand names are
+    reserved: a project with such a name must be given after the default
+    command name, as in 'ark report show trends'.
+    """
+
+    def __init__(
+        self, *args: Any, default_command: str, **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        """Insert the default command name if no subcommand is given."""
+        if not args or (
+            args[0] not in self.commands
+            and args[0] not in self.get_help_option_names(ctx)
+        ):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+class ProgressDisplay:
+    """
+    One status line of a playbook's progress, redrawn at a fixed interval.
+
+    Terminals get the line rewritten in place; other outputs, such as log
+    files, get a new line at a slower interval. Events between redraws only
+    update the tally, so the cost of a redraw does not grow with the number
+    of events or hosts. Task starts are always drawn.
+    """
+
+    TERMINAL_INTERVAL = 0.2  # Seconds
+    STREAM_INTERVAL = 10.0  # Seconds
+
+    def __init__(self, tally: ProgressTally) -> None:
+        self.tally = tally
+        self.stream: TextIO = sys.stderr
+        self.is_terminal = self.stream.isatty()
+        self.interval = (
+            self.TERMINAL_INTERVAL
+            if self.is_terminal
+            else self.STREAM_INTERVAL
+        )
+        self.last_update = 0.0
+
+    def handle_event(self, event: Any) -> bool:
+        """
+        Update the tally and redraw if the interval passed.
+
+        Can be passed to ansible_runner as the event handler.
+
+        Args:
+            event (Any): The runner event.
+
+        Returns:
+            bool: Always True, so the runner still writes the event.
+        """
+        self.tally.handle_event(event)
+        # Task starts are rare and show what a long task is waiting on.
+        self.update(force=event.get("event") == "playbook_on_task_start")
+        return True
+
+    def update(self, force: bool = False) -> None:
+        """
+        Redraw the status line.
+
+        Args:
+            force (bool, optional): Redraw even if the interval has not
+                passed. Defaults to False.
+        """
+        now = time.monotonic()
+        if not force and now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        if self.is_terminal:
+            # Lines wider than the terminal wrap and cannot be redrawn.
+            width = shutil.get_terminal_size().columns - 1
+            self.stream.write(f"\r{self.tally.summary()[:width]}\x1b[K")
+        else:
+            self.stream.write(f"{self.tally.summary()}\n")
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Draw the final status line and end it."""
+        self.update(force=True)
+        if self.is_terminal:
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def require_current_schema() -> None:
+    """
+    Stop with an upgrade hint if the database schema is out of date.
+
+    Startup applies most migrations by itself; the rest need
+    'ark db upgrade' before the models can be queried.
+
+    Raises:
+        click.ClickException: Migrations are pending.
+    """
+    version = migrations.get_schema_version(get_engine()) or 0
+    if version < migrations.LATEST_VERSION:
+        raise click.ClickException(
+            f"Database schema version {version} is older than "
+            f"{migrations.LATEST_VERSION}. Run 'ark db upgrade' to apply "
+            "pending migrations."
+        )
+
+
 def echo_or_page(content: str, page: Optional[bool]) -> None:
     """
     Echo content to the terminal or page it.
@@ -91,7 +233,7 @@ def echo_or_page(content: str, page: Optional[bool]) -> None:
 def project_name_validation_callback(
     ctx: click.Context,
     param: click.Parameter,  # pylint: disable=unused-argument
-    project_name: str,
+    project_name: Optional[str],
 ) -> Optional[str]:
     """
     Validate a project.
@@ -99,11 +241,14 @@ def project_name_validation_callback(
     Args:
         ctx (click.Context): Click context. Do not use.
         param (click.Parameter): Click parameter. Do not use.
-        project_name (str): Project name to validate.
+        project_name (Optional[str]): Project name to validate.
 
     Returns:
         Optional[str]: Validated value or None in case of an error.
     """
+    if project_name is None:
+        # Optional project argument that was not given.
+        return None
     logger.debug(
         "Validating project '%s' for the '%s' command.",
         project_name,
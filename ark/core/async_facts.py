@@ -0,0 +1,194 @@
+"""Ark - Async Ansible Facts."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import json
+import logging
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from ark.async_database import get_async_session, get_async_write_session
+from ark.core.facts import (
+    filter_host_facts,
+    group_fact_matches,
+    is_jsonb_dialect,
+    log_fact_pairs,
+    match_host_facts,
+    merge_host_facts,
+    select_host_facts,
+    select_hosts_by_fact,
+)
+from ark.models.facts import AnsibleHostFacts
+
+logger = logging.getLogger(__name__)
+
+
+@get_async_session
+async def query_host_facts(
+    fqdn: str,
+    fact_key: Optional[str] = None,
+    fuzzy: bool = False,
+    session: Optional[AsyncSession] = None,
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Query host facts.
+
+    Async variant of ark.core.facts.query_host_facts.
+
+    Args:
+        fqdn (str): Fully qualified domain name.
+        fact_key (Optional[str], optional): Ansible fact key.
+            Defaults to None.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+        session (Optional[AsyncSession], optional): Async database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Yields:
+        AsyncGenerator[Tuple[str, Any], None]: Fact key and value.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    if is_jsonb_dialect(session.bind.dialect):
+        result = await session.execute(
+            select(AnsibleHostFacts.id)
+            .where(AnsibleHostFacts.fqdn == fqdn)
+            .limit(1)
+        )
+        if result.first() is None:
+            logger.error("Host '%s' not found.", fqdn)
+            return
+        logger.info("Querying Host: '%s'", fqdn)
+        rows = await session.execute(select_host_facts(fqdn, fact_key, fuzzy))
+        for key, value in log_fact_pairs(rows, fqdn, fact_key):
+            yield key, value
+        return
+
+    result = await session.execute(
+        select(AnsibleHostFacts).where(AnsibleHostFacts.fqdn == fqdn).limit(1)
+    )
+    host: Optional[AnsibleHostFacts] = result.scalars().first()
+    if not host:
+        logger.error("Host '%s' not found.", fqdn)
+        return
+    logger.info("Querying Host: '%s'", host.fqdn)
+    for key, value in filter_host_facts(
+        host.fqdn, json.loads(host.facts), fact_key, fuzzy
+    ):
+        yield key, value
+
+
+@get_async_session
+async def query_hosts_by_fact(
+    fact_key: str,
+    fact_value: Any,
+    fuzzy: bool = False,
+    session: Optional[AsyncSession] = None,
+) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+    """
+    Query hosts by fact.
+
+    Async variant of ark.core.facts.query_hosts_by_fact. Hosts are streamed
+    from the database instead of being loaded all at once.
+
+    Args:
+        fact_key (str): Fact key.
+        fact_value (Any): Fact value.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+        session (Optional[AsyncSession], optional): Async database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Yields:
+        AsyncGenerator[Tuple[str, Dict[str, Any]], None]: Host and facts.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    if is_jsonb_dialect(session.bind.dialect):
+        rows = await session.execute(
+            select_hosts_by_fact(fact_key, fact_value, fuzzy)
+        )
+        for fqdn, matching_facts in group_fact_matches(
+            rows, fact_key, fact_value, fuzzy
+        ):
+            yield fqdn, matching_facts
+        return
+
+    hosts = await session.stream_scalars(select(AnsibleHostFacts))
+    async for host in hosts:
+        matching_facts = match_host_facts(
+            json.loads(host.facts), fact_key, fact_value, fuzzy
+        )
+        if matching_facts:
+            yield host.fqdn, matching_facts
+
+
+@get_async_session
+async def get_all_db_hosts(
+    session: Optional[AsyncSession] = None,
+) -> list[AnsibleHostFacts]:
+    """
+    Get all hosts from the database.
+
+    Async variant of ark.core.facts.get_all_db_hosts.
+
+    Args:
+        session (Optional[AsyncSession], optional): Async database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        list[AnsibleHostFacts]: List of AnsibleHostFacts objects.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    result = await session.execute(select(AnsibleHostFacts))
+    hosts = list(result.scalars().all())
+
+    if not hosts:
+        logger.warning("No hosts found in the database.")
+        return []
+
+    return hosts
+
+
+@get_async_write_session
+async def store_facts(
+    host_facts: Dict[str, AnsibleHostFacts],
+    session: Optional[AsyncSession] = None,
+) -> list[str]:
+    """
+    Store facts in the database.
+
+    Async variant of ark.core.facts.store_facts. The merge runs through the
+    same code as the sync variant, so history and change log entries are
+    identical.
+
+    Args:
+        host_facts (Dict[str, AnsibleHostFacts]): Host facts.
+        session (Optional[AsyncSession], optional): Async database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        list[str]: List of updated hosts.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    updated_hosts: list[str] = await session.run_sync(
+        lambda sync_session: merge_host_facts(host_facts, session=sync_session)
+    )
+    return updated_hosts
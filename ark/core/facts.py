@@ -1,21 +1,74 @@
 """Ark - Ansible Facts."""
 __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
+import hashlib
 import json
 import logging
-from pathlib import Path
-from typing import Any, Dict, Generator, Optional, Tuple, Union
-
+import string
+import tarfile
+import zipfile
+from datetime import datetime, timedelta
+from itertools import groupby
+from pathlib import Path, PurePosixPath
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import yaml
+from sqlalchemy import (
+    Boolean,
+    Text,
+    and_,
+    cast,
+    column,
+    func,
+    literal,
+    or_,
+    select,
+    true,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.engine import Dialect, Row
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import ColumnElement, Select
 from sqlmodel import Session
 
+import ark
 from ark import utils
-from ark.database import get_session, init_db
-from ark.models.facts import AnsibleHostFacts
+from ark.database import get_session, get_write_session, init_db
+from ark.models.facts import (
+    AnsibleHostFacts,
+    AnsibleHostFactsChange,
+    AnsibleHostFactsHistory,
+)
+from ark.models.types import JSONPath
 from ark.settings import config
 
 logger = logging.getLogger(__name__)
 
+# Stands in for a fact path that only one side of a diff has. A dedicated
+# object never equals a real fact value.
+FACT_MISSING = object()
+ARCHIVE_SUFFIXES = (
+    ".tar",
+    ".tar.gz",
+    ".tgz",
+    ".tar.bz2",
+    ".tbz2",
+    ".tar.xz",
+    ".txz",
+    ".zip",
+)
+ARCHIVE_IMPORT_BATCH_SIZE = 500
+CACHE_PLUGIN_NAME = "ark_facts"
 
 init_db()
 
@@ -85,6 +138,131 @@ def load_cache_dirs(
     return host_facts
 
 
+def is_fact_archive(archive_path: Union[str, Path]) -> bool:
+    """
+    Check if a path is a supported fact cache archive.
+
+    Args:
+        archive_path (Union[str, Path]): Path to check.
+
+    Returns:
+        bool: True if the path is a supported archive file.
+    """
+    archive_path = Path(archive_path)
+    return archive_path.is_file() and archive_path.name.lower().endswith(
+        ARCHIVE_SUFFIXES
+    )
+
+
+def iter_archive_caches(
+    archive_path: Union[str, Path]
+) -> Iterator[Tuple[str, AnsibleHostFacts]]:
+    """
+    Stream host facts from the fact cache directories inside an archive.
+
+    Members are read one at a time without extracting the archive. As with
+    find_caches, any directory named 'fact_cache' is treated as a fact
+    cache, and the files directly inside it are loaded.
+
+    Args:
+        archive_path (Union[str, Path]): Path to a tar or zip archive.
+
+    Yields:
+        Iterator[Tuple[str, AnsibleHostFacts]]: Hostname and host facts.
+    """
+    archive_path = Path(archive_path)
+    logger.info("Loading facts from archive: '%s'", archive_path)
+
+    def in_fact_cache(member_name: str) -> bool:
+        """Check if an archive member is a file inside a fact cache."""
+        return PurePosixPath(member_name).parent.name == "fact_cache"
+
+    def parse_member(
+        member_name: str, content: bytes
+    ) -> Optional[Tuple[str, AnsibleHostFacts]]:
+        """Parse an archive member into AnsibleHostFacts."""
+        hostname = PurePosixPath(member_name).name.replace(" ", "_").lower()
+        logger.debug(
+            "Loading facts for '%s' from '%s:%s'",
+            hostname,
+            archive_path,
+            member_name,
+        )
+        try:
+            host_facts = json.loads(content.decode(config.ENCODING))
+        except (UnicodeDecodeError, json.JSONDecodeError) as parse_error:
+            logger.error(
+                "Could not parse '%s:%s'. Error: '%s'",
+                archive_path,
+                member_name,
+                parse_error,
+            )
+            return None
+        return hostname, AnsibleHostFacts.from_json(json.dumps(host_facts))
+
+    if archive_path.name.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as zip_archive:
+            for zip_member in zip_archive.infolist():
+                if zip_member.is_dir() or not in_fact_cache(
+                    zip_member.filename
+                ):
+                    continue
+                with zip_archive.open(zip_member) as member_file:
+                    parsed = parse_member(
+                        zip_member.filename, member_file.read()
+                    )
+                if parsed:
+                    yield parsed
+        return
+
+    # Stream mode reads members sequentially, so compressed tarballs are
+    # never decompressed more than once or seeked through.
+    with tarfile.open(archive_path, mode="r|*") as tar_archive:
+        for tar_member in tar_archive:
+            if not tar_member.isfile() or not in_fact_cache(tar_member.name):
+                continue
+            tar_file = tar_archive.extractfile(tar_member)
+            if tar_file is None:
+                continue
+            parsed = parse_member(tar_member.name, tar_file.read())
+            if parsed:
+                yield parsed
+
+
+def import_archive(archive_path: Union[str, Path]) -> list[str]:
+    """
+    Import facts from a fact cache archive.
+
+    Host facts are stored in batches as they are streamed from the
+    archive, so memory use does not grow with the archive size.
+
+    Args:
+        archive_path (Union[str, Path]): Path to a tar or zip archive.
+
+    Raises:
+        tarfile.TarError: The tar archive is invalid or truncated.
+        zipfile.BadZipFile: The zip archive is invalid.
+
+    Returns:
+        list[str]: List of updated hosts.
+    """
+    updated_hosts: list[str] = []
+    host_facts: dict[str, AnsibleHostFacts] = {}
+    host_count = 0
+    for hostname, facts in iter_archive_caches(archive_path):
+        host_facts[hostname] = facts
+        host_count += 1
+        if len(host_facts) >= ARCHIVE_IMPORT_BATCH_SIZE:
+            updated_hosts.extend(store_facts(host_facts))
+            host_facts = {}
+    if host_facts:
+        updated_hosts.extend(store_facts(host_facts))
+    logger.info(
+        "Found facts for: '%s' hosts in '%s'.", host_count, archive_path
+    )
+    return updated_hosts
+
+
 def merge_and_compare_facts(
     existing_facts: str, new_facts: str
 ) -> Tuple[bool, str]:
@@ -107,7 +285,67 @@ def merge_and_compare_facts(
     return equality_check, merged_facts_str
 
 
-@get_session
+def get_changed_fact_keys(existing_facts: str, new_facts: str) -> list[str]:
+    """
+    Get the top-level fact keys changed by merging new facts.
+
+    Args:
+        existing_facts (str): Existing facts.
+        new_facts (str): New facts.
+
+    Returns:
+        list[str]: Sorted list of added or modified top-level fact keys.
+    """
+    existing_facts_dict = json.loads(existing_facts)
+    new_facts_dict = json.loads(new_facts)
+    missing = object()
+    return sorted(
+        key
+        for key, value in new_facts_dict.items()
+        if existing_facts_dict.get(key, missing) != value
+    )
+
+
+def archive_host_facts(host: AnsibleHostFacts, session: Session) -> None:
+    """
+    Archive the current facts of a host before they are overwritten.
+
+    Only the newest config.FACT_HISTORY_LIMIT entries are kept per host.
+
+    Args:
+        host (AnsibleHostFacts): Host whose facts are about to change.
+        session (Session): Database session.
+    """
+    if config.FACT_HISTORY_LIMIT <= 0:
+        return
+    session.add(
+        AnsibleHostFactsHistory(
+            fqdn=host.fqdn,
+            facts=host.facts,
+            last_modified=host.last_modified,
+            archived_at=datetime.now(),
+        )
+    )
+    session.flush()
+    expired_ids = [
+        history_id
+        for (history_id,) in session.query(AnsibleHostFactsHistory.id)
+        .filter_by(fqdn=host.fqdn)
+        .order_by(AnsibleHostFactsHistory.id.desc())  # type: ignore
+        .offset(config.FACT_HISTORY_LIMIT)
+    ]
+    if expired_ids:
+        logger.debug(
+            "Expiring '%s' history entries for '%s'.",
+            len(expired_ids),
+            host.fqdn,
+        )
+        session.query(AnsibleHostFactsHistory).filter(
+            AnsibleHostFactsHistory.id.in_(expired_ids)  # type: ignore
+        ).delete(synchronize_session=False)
+
+
+@get_write_session
 def store_facts(
     host_facts: Dict[str, AnsibleHostFacts], session: Optional[Session] = None
 ) -> list[str]:
@@ -129,25 +367,62 @@ def store_facts(
     if not session:
         raise ValueError("Session is required.")
 
+    return merge_host_facts(host_facts, session=session)
+
+
+def merge_host_facts(
+    host_facts: Dict[str, AnsibleHostFacts], session: Session
+) -> list[str]:
+    """
+    Merge host facts into the database, committing each host.
+
+    Shared by the synchronous and asynchronous store_facts.
+
+    Args:
+        host_facts (Dict[str, AnsibleHostFacts]): Host facts.
+        session (Session): Database session.
+
+    Raises:
+        integrity_error: Unknown IntegrityError occurred.
+
+    Returns:
+        list[str]: List of updated hosts.
+    """
     updated_hosts = []
     for host in host_facts.values():
         existing_host = (
             session.query(AnsibleHostFacts).filter_by(fqdn=host.fqdn).first()
         )
         if existing_host:
+            existing_host.last_seen = host.last_seen or datetime.now()
             equality_check, merged_facts_str = merge_and_compare_facts(
                 existing_host.facts, host.facts
             )
 
             if not equality_check:
+                changed_keys = get_changed_fact_keys(
+                    existing_host.facts, host.facts
+                )
+                archive_host_facts(existing_host, session=session)
                 existing_host.facts = merged_facts_str
                 existing_host.last_modified = host.last_modified
+                if changed_keys:
+                    session.add(
+                        AnsibleHostFactsChange.from_keys(
+                            host.fqdn, changed_keys
+                        )
+                    )
                 updated_hosts.append(host.fqdn)
         else:
             new_host = AnsibleHostFacts.from_json(
                 facts_json=host.facts,
             )
             session.add(new_host)
+            session.add(
+                AnsibleHostFactsChange.from_keys(
+                    host.fqdn, list(json.loads(host.facts))
+                )
+            )
             updated_hosts.append(host.fqdn)
         try:
             session.commit()
@@ -177,27 +452,36 @@ def store_facts(
 
 def recursive_import(target_dir: Union[str, Path]) -> Union[list[str], None]:
     """
-    Recursively import facts from a directory.
+    Recursively import facts from a directory or a fact cache archive.
 
     Args:
-        target_dir (Union[str, Path]): Directory to import facts from.
+        target_dir (Union[str, Path]): Directory or archive to import
+            facts from.
 
     Raises:
-        NotADirectoryError: Target directory is not a directory.
+        NotADirectoryError: Target is neither a directory nor a supported
+            archive.
 
     Returns:
         Union[list[str], None]: List of updated hosts.
     """
     target_dir = Path(target_dir).resolve()
-    if not Path(target_dir).is_dir():
-        logger.error("'%s' is not a directory.", target_dir)
-        raise NotADirectoryError(f"'{target_dir}' is not a directory.")
-
-    fact_cache_paths: list[Path] = find_caches(target_dir=target_dir)
-    host_facts: dict[str, AnsibleHostFacts] = load_cache_dirs(
-        fact_cache_paths=fact_cache_paths
-    )
-    updated_hosts: list[str] = store_facts(host_facts)
+    updated_hosts: list[str]
+    if is_fact_archive(target_dir):
+        updated_hosts = import_archive(target_dir)
+    elif Path(target_dir).is_dir():
+        fact_cache_paths: list[Path] = find_caches(target_dir=target_dir)
+        host_facts: dict[str, AnsibleHostFacts] = load_cache_dirs(
+            fact_cache_paths=fact_cache_paths
+        )
+        updated_hosts = store_facts(host_facts)
+    else:
+        logger.error(
+            "'%s' is not a directory or supported archive.", target_dir
+        )
+        raise NotADirectoryError(
+            f"'{target_dir}' is not a directory or supported archive."
+        )
 
     if updated_hosts:
         logger.info("Updated facts for hosts: '%s'", updated_hosts)
@@ -208,6 +492,69 @@ def recursive_import(target_dir: Union[str, Path]) -> Union[list[str], None]:
     return None
 
 
+def get_cache_plugin_envvars() -> dict[str, str]:
+    """
+    Get the Ansible environment variables that enable the Ark cache plugin.
+
+    Returns:
+        dict[str, str]: Environment variable names and values.
+    """
+    return {
+        "ANSIBLE_CACHE_PLUGIN": CACHE_PLUGIN_NAME,
+        "ANSIBLE_CACHE_PLUGINS": str(
+            Path(ark.__file__).parent / "plugins" / "cache"
+        ),
+        "ANSIBLE_CACHE_PLUGIN_CONNECTION": config.DB_URL,
+    }
+
+
+def configure_cache_plugin(project_name: str, enable: bool = True) -> bool:
+    """
+    Enable or disable the Ark cache plugin in a project's 'env/envvars'.
+
+    With the plugin enabled, facts gathered by 'ark run' are stored in the
+    Ark database directly. Comments in 'env/envvars' are not preserved.
+
+    Args:
+        project_name (str): Project name.
+        enable (bool, optional): Enable the plugin if True, disable it
+            otherwise. Defaults to True.
+
+    Returns:
+        bool: True if 'env/envvars' was changed, False otherwise.
+    """
+    envvars_path = Path(config.PROJECTS_DIR) / project_name / "env" / "envvars"
+    content = utils.read_file_contents(envvars_path) or ""
+    envvars: dict[str, Any] = yaml.safe_load(content) or {}
+    plugin_envvars = get_cache_plugin_envvars()
+
+    if enable:
+        updated_envvars = {**envvars, **plugin_envvars}
+    elif envvars.get("ANSIBLE_CACHE_PLUGIN") == CACHE_PLUGIN_NAME:
+        updated_envvars = {
+            key: value
+            for key, value in envvars.items()
+            if key not in plugin_envvars
+        }
+    else:
+        updated_envvars = envvars
+
+    if updated_envvars == envvars:
+        logger.info("No envvars changes for project: '%s'", project_name)
+        return False
+    logger.info(
+        "%s Ark cache plugin for project: '%s'",
+        "Enabling" if enable else "Disabling",
+        project_name,
+    )
+    return utils.write_file_contents(
+        envvars_path,
+        yaml.safe_dump(
+            updated_envvars, default_flow_style=False, explicit_start=True
+        ),
+    )
+
+
 @get_session
 def query_host_facts(
     fqdn: str,
@@ -235,6 +582,18 @@ def query_host_facts(
     if not session:
         raise ValueError("Session is required.")
 
+    if is_jsonb_dialect(session.get_bind().dialect):
+        if session.query(AnsibleHostFacts.id).filter_by(fqdn=fqdn).first():
+            logger.info("Querying Host: '%s'", fqdn)
+            yield from log_fact_pairs(
+                session.execute(select_host_facts(fqdn, fact_key, fuzzy)),
+                fqdn,
+                fact_key,
+            )
+        else:
+            logger.error("Host '%s' not found.", fqdn)
+        return
+
     host: Optional[AnsibleHostFacts] = (
         session.query(AnsibleHostFacts).filter_by(fqdn=fqdn).first()
     )
@@ -242,7 +601,30 @@ def query_host_facts(
         logger.error("Host '%s' not found.", fqdn)
         return
     logger.info("Querying Host: '%s'", host.fqdn)
-    facts = json.loads(host.facts)
+    yield from filter_host_facts(
+        host.fqdn, json.loads(host.facts), fact_key, fuzzy
+    )
+
+
+def filter_host_facts(
+    fqdn: str,
+    facts: Dict[str, Any],
+    fact_key: Optional[str] = None,
+    fuzzy: bool = False,
+) -> Generator[Tuple[str, Any], None, None]:
+    """
+    Filter the facts of a host by fact key.
+
+    Args:
+        fqdn (str): Fully qualified domain name.
+        facts (Dict[str, Any]): Host facts.
+        fact_key (Optional[str], optional): Ansible fact key.
+            Defaults to None (all facts).
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Yields:
+        Generator[Tuple[str, Any], None, None]: Fact key and value.
+    """
     logger.debug("Fact count: '%s'", len(facts))
     if fact_key:
         found = False
@@ -294,38 +676,257 @@ def query_hosts_by_fact(
     if not session:
         raise ValueError("Session is required.")
 
+    if is_jsonb_dialect(session.get_bind().dialect):
+        yield from group_fact_matches(
+            session.execute(
+                select_hosts_by_fact(fact_key, fact_value, fuzzy)
+            ),
+            fact_key,
+            fact_value,
+            fuzzy,
+        )
+        return
+
     hosts = session.query(AnsibleHostFacts).all()
 
-    def match_fact_pairs(
-        fact_key: str,
-        fact_value: Any,
-        key: str,
-        value: Any,
-        fuzzy: bool = False,
-    ) -> Optional[Any]:
-        """Match a fact key and value to a fact key and value."""
-        fact_value_str = str(fact_value)
-        match: bool = (
-            utils.fuzzy_match_strings(fact_key, key)
-            if fuzzy
-            else fact_key.lower() == key.lower()
+    for host in hosts:
+        matching_facts = match_host_facts(
+            json.loads(host.facts), fact_key, fact_value, fuzzy
         )
-        if match:
-            if isinstance(value, list):
-                for item in value:
-                    if fact_value_str in str(item):
-                        logger.debug("Matched '%s' to '%s'.", fact_key, key)
-                        return item
-            elif fact_value_str in str(value):
-                logger.debug("Matched '%s' to '%s'.", fact_key, key)
-                return value
-        return None
+        if matching_facts:
+            yield host.fqdn, matching_facts
 
-    for host in hosts:
-        facts = json.loads(host.facts)
+
+def match_fact_pairs(
+    fact_key: str,
+    fact_value: Any,
+    key: str,
+    value: Any,
+    fuzzy: bool = False,
+) -> Optional[Any]:
+    """
+    Match a fact key and value to a fact key and value.
+
+    Args:
+        fact_key (str): Fact key to look for.
+        fact_value (Any): Fact value to look for.
+        key (str): Host fact key.
+        value (Any): Host fact value.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Returns:
+        Optional[Any]: The matching value or list item, or None.
+    """
+    fact_value_str = str(fact_value)
+    match: bool = (
+        utils.fuzzy_match_strings(fact_key, key)
+        if fuzzy
+        else fact_key.lower().strip() == key.lower().strip()
+    )
+    if match:
+        if isinstance(value, list):
+            for item in value:
+                if fact_value_str in str(item):
+                    logger.debug("Matched '%s' to '%s'.", fact_key, key)
+                    return item
+        elif fact_value_str in str(value):
+            logger.debug("Matched '%s' to '%s'.", fact_key, key)
+            return value
+    return None
+
+
+def match_host_facts(
+    facts: Dict[str, Any],
+    fact_key: str,
+    fact_value: Any,
+    fuzzy: bool = False,
+) -> Dict[str, Any]:
+    """
+    Get the facts of a host that match a fact key and value.
+
+    Args:
+        facts (Dict[str, Any]): Host facts.
+        fact_key (str): Fact key.
+        fact_value (Any): Fact value.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: Matching fact keys and values.
+    """
+    return {
+        key: match
+        for key, value in facts.items()
+        if (match := match_fact_pairs(fact_key, fact_value, key, value, fuzzy))
+        is not None
+    }
+
+
+def is_jsonb_dialect(dialect: Dialect) -> bool:
+    """
+    Check if a database stores host facts as JSONB.
+
+    Args:
+        dialect (Dialect): The database dialect.
+
+    Returns:
+        bool: True if facts can be queried server-side.
+    """
+    return dialect.name == "postgresql"
+
+
+def match_fact_key(
+    key_column: ColumnElement[Any], fact_key: str, fuzzy: bool = False
+) -> ColumnElement[Boolean]:
+    """
+    Build a SQL condition that matches fact keys like match_fact_pairs.
+
+    Args:
+        key_column (ColumnElement[Any]): Fact key column.
+        fact_key (str): Fact key to look for.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Returns:
+        ColumnElement[Boolean]: The condition.
+    """
+    fact_key = fact_key.lower().strip()
+    key = func.lower(func.btrim(key_column, string.whitespace))
+    if not fuzzy:
+        return key == fact_key
+    return or_(
+        func.strpos(key, fact_key) > 0,
+        func.strpos(literal(fact_key, Text), key) > 0,
+    )
+
+
+def select_host_facts(
+    fqdn: str, fact_key: Optional[str] = None, fuzzy: bool = False
+) -> Select:
+    """
+    Select the top-level facts of a host from a JSONB facts column.
+
+    Args:
+        fqdn (str): Fully qualified domain name.
+        fact_key (Optional[str], optional): Ansible fact key.
+            Defaults to None (all facts).
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Returns:
+        Select: Query for fact key and value rows.
+    """
+    fact = func.jsonb_each(AnsibleHostFacts.facts).table_valued(
+        "key", column("value", JSONB)
+    )
+    query = (
+        select(fact.c.key, fact.c.value)
+        .select_from(AnsibleHostFacts)
+        .join(fact, true())
+        .where(AnsibleHostFacts.fqdn == fqdn)
+    )
+    if fact_key:
+        query = query.where(match_fact_key(fact.c.key, fact_key, fuzzy))
+    return query.order_by(fact.c.key)
+
+
+def select_hosts_by_fact(
+    fact_key: str, fact_value: Any, fuzzy: bool = False
+) -> Select:
+    """
+    Select candidate facts for query_hosts_by_fact from a JSONB column.
+
+    Keys are matched in SQL. Exact key lookups also check key existence with
+    the GIN-indexed '?|' operator, so the fact key must be given in its
+    stored case or in lower case. Values are filtered with a jsonpath that
+    finds strings, and list items, containing the value. Values of other
+    types are returned as candidates for match_fact_pairs.
+
+    Args:
+        fact_key (str): Fact key.
+        fact_value (Any): Fact value.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Returns:
+        Select: Query for host FQDN, fact key and fact value rows.
+    """
+    fact = func.jsonb_each(AnsibleHostFacts.facts).table_valued(
+        "key", column("value", JSONB)
+    )
+    value_path = (
+        'lax $ ? (@.type() != "string" || '
+        f'@ like_regex {json.dumps(str(fact_value))} flag "q")'
+    )
+    query = (
+        select(AnsibleHostFacts.fqdn, fact.c.key, fact.c.value)
+        .select_from(AnsibleHostFacts)
+        .join(fact, true())
+        .where(
+            match_fact_key(fact.c.key, fact_key, fuzzy),
+            func.jsonb_path_exists(
+                fact.c.value, cast(literal(value_path), JSONPath)
+            ),
+        )
+        .order_by(AnsibleHostFacts.id, fact.c.key)
+    )
+    if not fuzzy:
+        key_variants = sorted({fact_key.strip(), fact_key.strip().lower()})
+        query = query.where(
+            AnsibleHostFacts.facts.op(  # type: ignore
+                "?|", is_comparison=True
+            )(
+                literal(key_variants, ARRAY(Text))
+            )
+        )
+    return query
+
+
+def log_fact_pairs(
+    rows: Iterable[Row], fqdn: str, fact_key: Optional[str]
+) -> Generator[Tuple[str, Any], None, None]:
+    """
+    Pass through fact key and value rows, logging like filter_host_facts.
+
+    Args:
+        rows (Iterable[Row]): Fact key and value rows.
+        fqdn (str): Fully qualified domain name.
+        fact_key (Optional[str]): Ansible fact key.
+
+    Yields:
+        Generator[Tuple[str, Any], None, None]: Fact key and value.
+    """
+    found = False
+    for key, value in rows:
+        if fact_key:
+            logger.info("Matched '%s' to '%s'.", fact_key, key)
+        found = True
+        yield key, value
+    if fact_key and not found:
+        logger.warning(
+            "Fact key '%s' not found for host '%s'.", fact_key, fqdn
+        )
+
+
+def group_fact_matches(
+    rows: Iterable[Row],
+    fact_key: str,
+    fact_value: Any,
+    fuzzy: bool = False,
+) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+    """
+    Group candidate fact rows by host and apply match_fact_pairs.
+
+    Args:
+        rows (Iterable[Row]): Host FQDN, fact key and fact value rows,
+            ordered by host.
+        fact_key (str): Fact key.
+        fact_value (Any): Fact value.
+        fuzzy (bool, optional): Fuzzy match fact key. Defaults to False.
+
+    Yields:
+        Generator[Tuple[str, Dict[str, Any]], None, None]: Host and facts.
+    """
+    for fqdn, host_rows in groupby(rows, key=lambda row: row[0]):
         matching_facts = {
             key: match
-            for key, value in facts.items()
+            for _, key, value in host_rows
             if (
                 match := match_fact_pairs(
                     fact_key, fact_value, key, value, fuzzy
@@ -333,16 +934,237 @@ def query_hosts_by_fact(
             )
             is not None
         }
-
         if matching_facts:
-            yield host.fqdn, matching_facts
+            yield fqdn, matching_facts
+
+
+@get_session
+def query_fact_changes(
+    since: int = 0,
+    limit: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> Generator[AnsibleHostFactsChange, None, None]:
+    """
+    Query the fact change log.
+
+    Entries are yielded in ascending sequence order and fetched in batches,
+    so consumers can poll with the last sequence number they processed.
+
+    Args:
+        since (int, optional): Only return entries with a sequence number
+            greater than this value. Defaults to 0.
+        limit (Optional[int], optional): Maximum number of entries to return.
+            Defaults to None.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Yields:
+        Generator[AnsibleHostFactsChange, None, None]: Change log entries.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    query = (
+        session.query(AnsibleHostFactsChange)
+        .filter(AnsibleHostFactsChange.sequence > since)
+        .order_by(AnsibleHostFactsChange.sequence)
+    )
+    if limit:
+        query = query.limit(limit)
+    logger.info("Querying fact changes since sequence: '%s'", since)
+    yield from query.yield_per(500)
+
+
+@get_session
+def get_host_facts(
+    fqdn: str,
+    previous: int = 0,
+    session: Optional[Session] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Get the facts of a host, optionally from a previous import.
+
+    Args:
+        fqdn (str): Fully qualified domain name.
+        previous (int, optional): Number of imports to go back in the host
+            history. Defaults to 0 (current facts).
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        Optional[Dict[str, Any]]: Host facts or None if not found.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    if previous <= 0:
+        host = session.query(AnsibleHostFacts).filter_by(fqdn=fqdn).first()
+        if not host:
+            logger.error("Host '%s' not found.", fqdn)
+            return None
+        return dict(json.loads(host.facts))
+
+    history = (
+        session.query(AnsibleHostFactsHistory)
+        .filter_by(fqdn=fqdn)
+        .order_by(AnsibleHostFactsHistory.id.desc())  # type: ignore
+        .offset(previous - 1)
+        .first()
+    )
+    if not history:
+        logger.error(
+            "No history entry '%s' imports back for host '%s'.",
+            previous,
+            fqdn,
+        )
+        return None
+    logger.info(
+        "Using facts of '%s' from: '%s'", fqdn, history.last_modified
+    )
+    return dict(json.loads(history.facts))
 
 
 @get_session
+def get_host_fqdn(
+    hostname: str,
+    session: Optional[Session] = None,
+) -> Optional[str]:
+    """
+    Get the FQDN of a host by its hostname.
+
+    Args:
+        hostname (str): Short hostname, as in 'ansible_hostname'.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        Optional[str]: The FQDN or None if the host is not found.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    host = session.query(AnsibleHostFacts).filter_by(hostname=hostname).first()
+    if not host:
+        return None
+    return str(host.fqdn)
+
+
+def _digest_fact_tree(value: Any, digests: Dict[int, bytes]) -> bytes:
+    """
+    Hash a fact tree bottom-up, recording the digest of every subtree.
+
+    Args:
+        value (Any): Fact value.
+        digests (Dict[int, bytes]): Subtree digests keyed by object id.
+
+    Returns:
+        bytes: Digest of the value.
+    """
+    hasher = hashlib.sha1()
+    if isinstance(value, dict):
+        hasher.update(b"d")
+        for key in sorted(value):
+            hasher.update(json.dumps(key).encode())
+            hasher.update(_digest_fact_tree(value[key], digests))
+    elif isinstance(value, list):
+        hasher.update(b"l")
+        for item in value:
+            hasher.update(_digest_fact_tree(item, digests))
+    else:
+        hasher.update(b"s")
+        hasher.update(json.dumps(value, sort_keys=True).encode())
+    digest = hasher.digest()
+    if isinstance(value, (dict, list)):
+        digests[id(value)] = digest
+    return digest
+
+
+class FactDifference(NamedTuple):
+    """Differing leaf of two fact trees."""
+
+    path: str
+    left: Any
+    right: Any
+    change: str  # 'added', 'removed' or 'changed'
+
+
+def diff_facts(
+    left: Dict[str, Any], right: Dict[str, Any]
+) -> Iterator[FactDifference]:
+    """
+    Structurally diff two fact trees.
+
+    Both trees are hashed once, so identical subtrees are skipped without
+    being walked. A path that only one tree has is reported as 'added' or
+    'removed', with None as the value of the other tree.
+
+    Args:
+        left (Dict[str, Any]): Left fact tree.
+        right (Dict[str, Any]): Right fact tree.
+
+    Yields:
+        Iterator[FactDifference]: Every differing leaf.
+    """
+    left_digests: Dict[int, bytes] = {}
+    right_digests: Dict[int, bytes] = {}
+    _digest_fact_tree(left, left_digests)
+    _digest_fact_tree(right, right_digests)
+
+    def walk(
+        path: str, left_value: Any, right_value: Any
+    ) -> Iterator[FactDifference]:
+        """Walk differing subtrees."""
+        left_digest = left_digests.get(id(left_value))
+        if left_digest is not None and left_digest == right_digests.get(
+            id(right_value)
+        ):
+            return
+        if isinstance(left_value, dict) and isinstance(right_value, dict):
+            for key in sorted(set(left_value) | set(right_value)):
+                yield from walk(
+                    f"{path}.{key}" if path else str(key),
+                    left_value.get(key, FACT_MISSING),
+                    right_value.get(key, FACT_MISSING),
+                )
+        elif isinstance(left_value, list) and isinstance(right_value, list):
+            for index in range(max(len(left_value), len(right_value))):
+                yield from walk(
+                    f"{path}[{index}]",
+                    left_value[index]
+                    if index < len(left_value)
+                    else FACT_MISSING,
+                    right_value[index]
+                    if index < len(right_value)
+                    else FACT_MISSING,
+                )
+        elif left_value is FACT_MISSING:
+            yield FactDifference(path, None, right_value, "added")
+        elif right_value is FACT_MISSING:
+            yield FactDifference(path, left_value, None, "removed")
+        elif left_value != right_value or type(left_value) is not type(
+            right_value
+        ):
+            yield FactDifference(path, left_value, right_value, "changed")
+
+    yield from walk("", left, right)
+
+
+@get_write_session
 def remove_host(fqdn: str, session: Optional[Session] = None) -> bool:
     """
     Remove a host from the database.
 
+    A 'removed' entry is added to the fact change log.
+
     Args:
         fqdn (str): Fully qualified domain name.
         session (Optional[Session], optional): Database session.
@@ -363,13 +1185,98 @@ def remove_host(fqdn: str, session: Optional[Session] = None) -> bool:
         logger.warning("Host '%s' not found.", fqdn)
         return False
 
+    session.query(AnsibleHostFactsHistory).filter_by(fqdn=fqdn).delete(
+        synchronize_session=False
+    )
     session.delete(host)
+    session.add(AnsibleHostFactsChange.from_keys(fqdn, [], removed=True))
     session.commit()
 
     logger.info("Removed host '%s' from the database.", fqdn)
     return True
 
 
+@get_write_session
+def prune_hosts(
+    older_than: timedelta,
+    dry_run: bool = False,
+    session: Optional[Session] = None,
+) -> list[str]:
+    """
+    Remove all hosts that have not been seen in an import for a while.
+
+    Hosts and their fact history are deleted with set-based statements in a
+    single transaction, which also adds a 'removed' fact change log entry
+    for each host.
+
+    Args:
+        older_than (timedelta): Remove hosts last seen before this long ago.
+        dry_run (bool, optional): Only report the hosts that would be
+            removed. Defaults to False.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        list[str]: List of removed (or stale, for a dry run) hosts.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    cutoff = datetime.now() - older_than
+    logger.info("Pruning hosts last seen before: '%s'", cutoff)
+    stale_filter = or_(
+        AnsibleHostFacts.last_seen < cutoff,  # type: ignore
+        and_(
+            AnsibleHostFacts.last_seen.is_(None),  # type: ignore
+            AnsibleHostFacts.last_modified < cutoff,
+        ),
+    )
+    stale_hosts = [
+        fqdn
+        for (fqdn,) in session.query(AnsibleHostFacts.fqdn)
+        .filter(stale_filter)
+        .order_by(AnsibleHostFacts.fqdn)
+    ]
+    if dry_run or not stale_hosts:
+        logger.info("Stale hosts: '%s'", stale_hosts)
+        return stale_hosts
+
+    stale_fqdns = session.query(AnsibleHostFacts.fqdn).filter(stale_filter)
+    session.execute(
+        AnsibleHostFactsChange.__table__.insert().from_select(  # type: ignore
+            ["fqdn", "changed_keys", "timestamp", "removed"],
+            select(
+                AnsibleHostFacts.fqdn,
+                literal(json.dumps([])),
+                literal(datetime.now()),
+                true(),
+            )
+            .where(stale_filter)
+            .order_by(AnsibleHostFacts.fqdn),
+        )
+    )
+    session.query(AnsibleHostFactsHistory).filter(
+        AnsibleHostFactsHistory.fqdn.in_(  # type: ignore
+            stale_fqdns.scalar_subquery()
+        )
+    ).delete(synchronize_session=False)
+    removed_count = (
+        session.query(AnsibleHostFacts)
+        .filter(stale_filter)
+        .delete(synchronize_session=False)
+    )
+    session.commit()
+    logger.info(
+        "Pruned '%s' hosts from the database: '%s'",
+        removed_count,
+        stale_hosts,
+    )
+    return stale_hosts
+
+
 @get_session
 def get_all_db_hosts(
     session: Optional[Session] = None,
@@ -40,12 +40,16 @@ def get_host(project_name: str, host_name: str) -> Union[Host, None]:
     return inventory.get_host(host_name)
 
 
-def get_project_hosts(target_project: str) -> list[Host]:
+def get_project_hosts(
+    target_project: str, limit: Optional[str] = None
+) -> list[Host]:
     """
     Get all hosts in a project.
 
     Args:
         target_project (str): Project name.
+        limit (Optional[str], optional): Only get the hosts matching an
+            Ansible limit pattern. Defaults to None.
 
     Returns:
         list[Host]: List of hosts.
@@ -57,6 +61,8 @@ def get_project_hosts(target_project: str) -> list[Host]:
             str(Path(config.PROJECTS_DIR) / target_project / "inventory"),
         ],
     )
+    if limit:
+        inventory.subset(limit)
     hosts = sorted(
         inventory.get_hosts(),
         key=lambda host: host.name,  # type: ignore
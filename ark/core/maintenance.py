@@ -0,0 +1,321 @@
+"""Ark - Database Maintenance."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel
+
+from ark.database import get_engine, writer_lock
+from ark.models.facts import AnsibleHostFacts
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_MODES = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+
+class ObjectStats(NamedTuple):
+    """Size statistics of a table or index."""
+
+    name: str
+    kind: str
+    rows: Optional[int]
+    size: Optional[int]
+    fragmentation: Optional[float]
+
+
+class DatabaseStats(NamedTuple):
+    """Size and health statistics of a database."""
+
+    page_size: Optional[int]
+    page_count: Optional[int]
+    freelist_count: Optional[int]
+    auto_vacuum: Optional[str]
+    objects: List[ObjectStats]
+    largest_facts: List[Tuple[str, int]]
+
+    @property
+    def size(self) -> Optional[int]:
+        """Database size in bytes."""
+        if self.page_size is None or self.page_count is None:
+            return None
+        return self.page_size * self.page_count
+
+    @property
+    def free_ratio(self) -> Optional[float]:
+        """Share of database pages on the freelist."""
+        if not self.page_count or self.freelist_count is None:
+            return None
+        return self.freelist_count / self.page_count
+
+
+class MaintenanceResult(NamedTuple):
+    """Outcome of a database maintenance run."""
+
+    integrity_errors: Optional[List[str]]
+    analyzed: bool
+    freed_pages: Optional[int]
+    checkpoint: Optional[Tuple[int, int, int]]
+    # No incremental auto-vacuum to run, see the 'full_vacuum' argument.
+    vacuum_skipped: bool = False
+
+
+def get_pragma(connection: Connection, name: str) -> Optional[int]:
+    """
+    Read a single-value SQLite pragma.
+
+    Args:
+        connection (Connection): The database connection.
+        name (str): Pragma name.
+
+    Returns:
+        Optional[int]: The pragma value.
+    """
+    value = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    return None if value is None else int(value)
+
+
+def get_object_sizes(
+    connection: Connection,
+) -> Dict[str, Tuple[int, Optional[float]]]:
+    """
+    Get the size and fragmentation of every SQLite table and index.
+
+    Fragmentation is the share of unused bytes in the object's pages.
+    Requires SQLite built with the dbstat virtual table.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        Dict[str, Tuple[int, Optional[float]]]: Size in bytes and
+            fragmentation by object name. Empty if dbstat is unavailable.
+    """
+    try:
+        rows = connection.exec_driver_sql(
+            "SELECT name, sum(pgsize), sum(unused) FROM dbstat GROUP BY name"
+        ).all()
+    except OperationalError:
+        logger.info("SQLite dbstat is not available, skipping object sizes.")
+        return {}
+    return {
+        name: (size, unused / size if size else None)
+        for name, size, unused in rows
+    }
+
+
+def get_database_stats(
+    db_url: Optional[str] = None, top: int = 10
+) -> DatabaseStats:
+    """
+    Collect size, fragmentation and row count statistics.
+
+    Only reads from the database, so it is safe to run at any time.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+        top (int, optional): Number of largest fact blobs to report.
+            PostgreSQL reports their stored, compressed size.
+            Defaults to 10.
+
+    Returns:
+        DatabaseStats: The database statistics.
+    """
+    engine = get_engine(db_url)
+    is_sqlite = engine.dialect.name == "sqlite"
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.connect() as connection:
+        page_size = page_count = freelist_count = None
+        auto_vacuum = None
+        object_sizes: Dict[str, Tuple[int, Optional[float]]] = {}
+        object_kinds: Dict[str, str] = {}
+        if is_sqlite:
+            page_size = get_pragma(connection, "page_size")
+            page_count = get_pragma(connection, "page_count")
+            freelist_count = get_pragma(connection, "freelist_count")
+            auto_vacuum = AUTO_VACUUM_MODES.get(
+                get_pragma(connection, "auto_vacuum") or 0
+            )
+            object_sizes = get_object_sizes(connection)
+            object_kinds = {
+                name: kind
+                for name, kind in connection.exec_driver_sql(
+                    "SELECT name, type FROM sqlite_master "
+                    "WHERE type IN ('table', 'index')"
+                )
+            }
+
+        objects = []
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            rows = connection.execute(
+                select(func.count()).select_from(table)
+            ).scalar()
+            size, fragmentation = object_sizes.get(table.name, (None, None))
+            objects.append(
+                ObjectStats(table.name, "table", rows, size, fragmentation)
+            )
+        for name, kind in sorted(object_kinds.items()):
+            if kind == "index":
+                size, fragmentation = object_sizes.get(name, (None, None))
+                objects.append(
+                    ObjectStats(name, "index", None, size, fragmentation)
+                )
+
+        largest_facts: List[Tuple[str, int]] = []
+        if AnsibleHostFacts.__tablename__ in existing_tables:
+            fact_size = (
+                func.pg_column_size(AnsibleHostFacts.facts)
+                if engine.dialect.name == "postgresql"
+                else func.length(AnsibleHostFacts.facts)
+            )
+            largest_facts = [
+                (fqdn, size)
+                for fqdn, size in connection.execute(
+                    select(AnsibleHostFacts.fqdn, fact_size)
+                    .order_by(fact_size.desc())
+                    .limit(top)
+                )
+            ]
+
+    return DatabaseStats(
+        page_size,
+        page_count,
+        freelist_count,
+        auto_vacuum,
+        objects,
+        largest_facts,
+    )
+
+
+def check_integrity(
+    connection: Connection, quick: bool = False
+) -> List[str]:
+    """
+    Run the SQLite integrity check.
+
+    Args:
+        connection (Connection): The database connection.
+        quick (bool, optional): Use the faster 'quick_check', which skips
+            index consistency checks. Defaults to False.
+
+    Returns:
+        List[str]: Reported problems. Empty if the database is healthy.
+    """
+    pragma = "quick_check" if quick else "integrity_check"
+    messages = [
+        row[0] for row in connection.exec_driver_sql(f"PRAGMA {pragma}")
+    ]
+    return [message for message in messages if message != "ok"]
+
+
+def maintain_database(
+    db_url: Optional[str] = None,
+    quick_check: bool = False,
+    full_vacuum: bool = False,
+) -> MaintenanceResult:
+    """
+    Run routine database maintenance.
+
+    Runs an integrity check, ANALYZE, an incremental VACUUM and a passive
+    WAL checkpoint. Write steps hold the writer lock and none of the steps
+    block readers, so this is safe to run from cron. Nothing is written if
+    the integrity check fails.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+        quick_check (bool, optional): Run 'quick_check' instead of the full
+            integrity check. Defaults to False.
+        full_vacuum (bool, optional): Rebuild the database with a full
+            VACUUM, switching it to incremental auto-vacuum. Needs free disk
+            space for a copy of the database. Defaults to False.
+
+    Returns:
+        MaintenanceResult: The maintenance outcome.
+    """
+    engine = get_engine(db_url)
+    if engine.dialect.name != "sqlite":
+        return maintain_server_database(engine)
+
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        logger.info("Checking database integrity.")
+        integrity_errors = check_integrity(connection, quick=quick_check)
+        if integrity_errors:
+            logger.error(
+                "Database integrity check failed: %s", integrity_errors
+            )
+            return MaintenanceResult(integrity_errors, False, None, None)
+
+        with writer_lock(db_url):
+            logger.info("Analyzing database.")
+            connection.exec_driver_sql("ANALYZE")
+
+            freelist_count = get_pragma(connection, "freelist_count") or 0
+            vacuum_skipped = False
+            if full_vacuum:
+                logger.info("Rebuilding database with VACUUM.")
+                connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+                connection.exec_driver_sql("VACUUM")
+            elif get_pragma(connection, "auto_vacuum") == 2:
+                logger.info("Running incremental VACUUM.")
+                # The pragma frees one page per step and the driver only
+                # steps it once through execute(), so run it as a script.
+                connection.connection.executescript(
+                    "PRAGMA incremental_vacuum;"
+                )
+            else:
+                logger.warning(
+                    "Database does not use incremental auto-vacuum. "
+                    "Run with a full VACUUM once to enable it."
+                )
+                vacuum_skipped = True
+            freed_pages = freelist_count - (
+                get_pragma(connection, "freelist_count") or 0
+            )
+
+        logger.info("Checkpointing the write-ahead log.")
+        busy, log_pages, checkpointed_pages = connection.exec_driver_sql(
+            "PRAGMA wal_checkpoint(PASSIVE)"
+        ).one()
+    return MaintenanceResult(
+        [],
+        True,
+        None if vacuum_skipped else freed_pages,
+        (busy, log_pages, checkpointed_pages),
+        vacuum_skipped,
+    )
+
+
+def maintain_server_database(engine: Engine) -> MaintenanceResult:
+    """
+    Run routine maintenance on a database server.
+
+    Only PostgreSQL is supported. Integrity checks and checkpoints are
+    left to the server.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        MaintenanceResult: The maintenance outcome.
+    """
+    if engine.dialect.name != "postgresql":
+        logger.warning(
+            "Maintenance is not supported for '%s' databases.",
+            engine.dialect.name,
+        )
+        return MaintenanceResult(None, False, None, None)
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        logger.info("Vacuuming and analyzing database.")
+        connection.execute(text("VACUUM ANALYZE"))
+    return MaintenanceResult(None, True, None, None)
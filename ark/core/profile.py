@@ -0,0 +1,399 @@
+"""Ark - Playbook Profiling."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlmodel import Session
+
+from ark.database import get_session, get_write_session, init_db
+from ark.models.events import TaskResult
+from ark.settings import config
+
+logger = logging.getLogger(__name__)
+
+TASK_RESULT_EVENTS = {
+    "runner_on_ok": "ok",
+    "runner_on_failed": "failed",
+    "runner_on_unreachable": "unreachable",
+    "runner_on_skipped": "skipped",
+}
+RECORD_BATCH_SIZE = 1000
+PRUNE_BATCH_SIZE = 500
+
+
+init_db()
+
+
+class RunProfile(NamedTuple):
+    """Timing of one recorded playbook run."""
+
+    run_id: str
+    playbook: Optional[str]
+    start: datetime
+    end: datetime
+    hosts: int
+    results: int
+    task_time: float
+
+    @property
+    def wall_time(self) -> float:
+        """Seconds from the first task start to the last task end."""
+        return (self.end - self.start).total_seconds()
+
+
+class TaskProfile(NamedTuple):
+    """Timing of one task across the hosts of a run."""
+
+    task: str
+    hosts: int
+    wall_time: float
+    average: float
+    longest: float
+
+
+class HostProfile(NamedTuple):
+    """Timing of all tasks of one host in a run."""
+
+    host: str
+    tasks: int
+    total: float
+    longest: float
+    failed: int
+
+
+def parse_event_time(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a runner event timestamp as naive local time.
+
+    Args:
+        value (Optional[str]): ISO 8601 timestamp, usually in UTC.
+
+    Returns:
+        Optional[datetime]: The local time, or None if it is missing or
+            invalid.
+    """
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+def get_task_result_row(
+    project_name: str, event: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Get the task result of a runner event as a table row.
+
+    Args:
+        project_name (str): The name of the project.
+        event (Dict[str, Any]): The runner event.
+
+    Returns:
+        Optional[Dict[str, Any]]: The row, or None if the event is not a
+            timed task result.
+    """
+    result = TASK_RESULT_EVENTS.get(event.get("event") or "")
+    if result is None:
+        return None
+    event_data = event.get("event_data") or {}
+    start = parse_event_time(event_data.get("start"))
+    end = parse_event_time(event_data.get("end"))
+    if start is None or end is None or not event_data.get("host"):
+        return None
+    if result == "failed" and event_data.get("ignore_errors"):
+        result = "ignored"
+    duration = event_data.get("duration")
+    return {
+        "project": project_name,
+        "run_id": event.get("runner_ident") or "",
+        "playbook": (event_data.get("playbook") or "").rsplit("/", 1)[-1]
+        or None,
+        "task_uuid": event_data.get("task_uuid") or "",
+        "task": event_data.get("task") or "",
+        "host": event_data["host"],
+        "start": start,
+        "end": end,
+        "duration": (
+            float(duration)
+            if duration is not None
+            else (end - start).total_seconds()
+        ),
+        "result": result,
+        "changed": bool((event_data.get("res") or {}).get("changed")),
+    }
+
+
+@get_write_session
+def store_task_results(
+    rows: List[Dict[str, Any]], session: Optional[Session] = None
+) -> None:
+    """
+    Store task result rows.
+
+    Args:
+        rows (List[Dict[str, Any]]): Rows from get_task_result_row.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+    session.execute(TaskResult.__table__.insert(), rows)  # type: ignore
+    session.commit()
+    logger.debug("Stored '%s' task results.", len(rows))
+
+
+class TaskResultRecorder:
+    """
+    Record the task results of a running playbook.
+
+    Results are buffered and stored in batches, so the runner is not held
+    up by a database write per event.
+    """
+
+    def __init__(self, project_name: str) -> None:
+        self.project_name = project_name
+        self.rows: List[Dict[str, Any]] = []
+        self.enabled = True
+
+    def handle_event(self, event: Dict[str, Any]) -> bool:
+        """
+        Buffer the task result of a runner event.
+
+        Can be passed to ansible_runner as the event handler.
+
+        Args:
+            event (Dict[str, Any]): The runner event.
+
+        Returns:
+            bool: Always True, so the runner still writes the event.
+        """
+        row = get_task_result_row(self.project_name, event)
+        if row is not None and self.enabled:
+            self.rows.append(row)
+            if len(self.rows) >= RECORD_BATCH_SIZE:
+                self.flush()
+        return True
+
+    def flush(self) -> None:
+        """Store the buffered task results."""
+        rows, self.rows = self.rows, []
+        if not rows or not self.enabled:
+            return
+        try:
+            store_task_results(rows)
+        except (OperationalError, ProgrammingError) as error:
+            # Usually a pending 'ark db upgrade'. The run itself goes on.
+            logger.warning("Could not store task results: %s", error)
+            self.enabled = False
+
+
+@get_write_session
+def prune_task_results(
+    project_name: str, session: Optional[Session] = None
+) -> int:
+    """
+    Remove the task results of runs whose artifacts no longer exist, such
+    as artifacts removed by artifact rotation.
+
+    Args:
+        project_name (str): The name of the project.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        int: Number of removed runs.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+    artifacts_path = Path(config.PROJECTS_DIR) / project_name / "artifacts"
+    stale_run_ids = [
+        run_id
+        for (run_id,) in session.query(TaskResult.run_id)
+        .filter(TaskResult.project == project_name)
+        .distinct()
+        if not run_id or not (artifacts_path / run_id).is_dir()
+    ]
+    for start in range(0, len(stale_run_ids), PRUNE_BATCH_SIZE):
+        session.query(TaskResult).filter(
+            TaskResult.project == project_name,
+            TaskResult.run_id.in_(  # type: ignore
+                stale_run_ids[start : start + PRUNE_BATCH_SIZE]
+            ),
+        ).delete(synchronize_session=False)
+    session.commit()
+    if stale_run_ids:
+        logger.debug(
+            "Removed task results of '%s' runs of project: '%s'",
+            len(stale_run_ids),
+            project_name,
+        )
+    return len(stale_run_ids)
+
+
+@get_session
+def get_run_profiles(
+    project_name: str, limit: int = 10, session: Optional[Session] = None
+) -> List[RunProfile]:
+    """
+    Get the timing of a project's recorded runs.
+
+    Args:
+        project_name (str): The name of the project.
+        limit (int, optional): Number of runs. Defaults to 10.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        List[RunProfile]: The newest runs first.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+    run_start = func.min(TaskResult.start)
+    query = (
+        session.query(
+            TaskResult.run_id,
+            func.max(TaskResult.playbook),
+            run_start,
+            func.max(TaskResult.end),
+            func.count(func.distinct(TaskResult.host)),
+            func.count(),
+            func.sum(TaskResult.duration),
+        )
+        .filter(TaskResult.project == project_name)
+        .group_by(TaskResult.run_id)
+        .order_by(run_start.desc())
+        .limit(limit)
+    )
+    return [RunProfile(*row) for row in query]
+
+
+@get_session
+def get_task_profiles(
+    project_name: str,
+    run_id: str,
+    top: int = 10,
+    session: Optional[Session] = None,
+) -> List[TaskProfile]:
+    """
+    Get the slowest tasks of a run.
+
+    Tasks are ranked by wall time, from the first host starting the task to
+    the last host finishing it, which is what a task adds to the run time.
+    Tasks are told apart by the runner's task UUID, so tasks that share a
+    name are listed separately.
+
+    Args:
+        project_name (str): The name of the project.
+        run_id (str): The run id.
+        top (int, optional): Number of tasks. Defaults to 10.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        List[TaskProfile]: The slowest tasks first.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+    query = (
+        session.query(
+            func.max(TaskResult.task),
+            func.count(func.distinct(TaskResult.host)),
+            func.min(TaskResult.start),
+            func.max(TaskResult.end),
+            func.avg(TaskResult.duration),
+            func.max(TaskResult.duration),
+        )
+        .filter(
+            TaskResult.project == project_name,
+            TaskResult.run_id == run_id,
+        )
+        .group_by(TaskResult.task_uuid)
+    )
+    profiles = [
+        TaskProfile(
+            task, hosts, (end - start).total_seconds(), average, longest
+        )
+        for task, hosts, start, end, average, longest in query
+    ]
+    profiles.sort(key=lambda profile: profile.wall_time, reverse=True)
+    return profiles[:top]
+
+
+@get_session
+def get_host_profiles(
+    project_name: str,
+    run_id: str,
+    top: int = 10,
+    session: Optional[Session] = None,
+) -> List[HostProfile]:
+    """
+    Get the hosts of a run that spent the most time in tasks.
+
+    Args:
+        project_name (str): The name of the project.
+        run_id (str): The run id.
+        top (int, optional): Number of hosts. Defaults to 10.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        List[HostProfile]: The slowest hosts first.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+    total = func.sum(TaskResult.duration)
+    query = (
+        session.query(
+            TaskResult.host,
+            func.count(),
+            total,
+            func.max(TaskResult.duration),
+            func.sum(
+                case(
+                    (
+                        TaskResult.result.in_(  # type: ignore
+                            ("failed", "unreachable")
+                        ),
+                        1,
+                    ),
+                    else_=0,
+                )
+            ),
+        )
+        .filter(
+            TaskResult.project == project_name,
+            TaskResult.run_id == run_id,
+        )
+        .group_by(TaskResult.host)
+        .order_by(total.desc())
+        .limit(top)
+    )
+    return [
+        HostProfile(host, tasks, total_time, longest, int(failed or 0))
+        for host, tasks, total_time, longest, failed in query
+    ]
@@ -0,0 +1,220 @@
+"""Ark - Playbook Progress."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set
+
+from ark.core import report
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_POLL_INTERVAL = 0.5  # Seconds
+FOLLOW_START_TIMEOUT = 60.0  # Seconds
+FOLLOW_EXIT_GRACE = 5.0  # Seconds
+HOST_COUNTERS = ("ok", "changed", "failed", "unreachable", "skipped")
+
+
+class ProgressTally:
+    """
+    Per-host task outcome counts of a running playbook.
+
+    Counts follow the play recap: 'ok' includes changed tasks and failed
+    tasks with ignore_errors count as 'ignored'. The number of hosts with
+    at least one changed, failed or unreachable task is kept up to date on
+    every event, so a summary never walks all hosts.
+    """
+
+    def __init__(self) -> None:
+        self.hosts: Dict[str, Dict[str, int]] = {}
+        self.host_sets: Dict[str, Set[str]] = {
+            counter: set() for counter in HOST_COUNTERS
+        }
+        self.task: Optional[str] = None
+        self.events = 0
+        self.finished = False
+
+    def count(self, host: str, counter: str) -> None:
+        """
+        Count a task outcome for a host.
+
+        Args:
+            host (str): The host name.
+            counter (str): The recap counter.
+        """
+        host_stats = self.hosts.setdefault(host, {})
+        host_stats[counter] = host_stats.get(counter, 0) + 1
+        if counter in self.host_sets:
+            self.host_sets[counter].add(host)
+
+    def handle_event(self, event: Dict[str, Any]) -> bool:
+        """
+        Update the tally from a runner event.
+
+        Can be passed to ansible_runner as the event handler.
+
+        Args:
+            event (Dict[str, Any]): The runner event.
+
+        Returns:
+            bool: Always True, so the runner still writes the event to the
+                artifact.
+        """
+        self.events += 1
+        event_name = event.get("event")
+        event_data = event.get("event_data") or {}
+        host = event_data.get("host")
+        if event_name == "playbook_on_task_start":
+            self.task = event_data.get("task")
+        elif event_name == "runner_on_ok" and host:
+            self.count(host, "ok")
+            if (event_data.get("res") or {}).get("changed"):
+                self.count(host, "changed")
+        elif event_name == "runner_on_failed" and host:
+            if event_data.get("ignore_errors"):
+                self.count(host, "ignored")
+            else:
+                self.count(host, "failed")
+        elif event_name == "runner_on_unreachable" and host:
+            self.count(host, "unreachable")
+        elif event_name == "runner_on_skipped" and host:
+            self.count(host, "skipped")
+        elif event_name == report.STATS_EVENT:
+            # The final recap is authoritative.
+            self.hosts = report.extract_event_host_stats(event_data)
+            self.host_sets = {
+                counter: {
+                    host_name
+                    for host_name, stats in self.hosts.items()
+                    if stats.get(counter)
+                }
+                for counter in HOST_COUNTERS
+            }
+            self.task = None
+            self.finished = True
+        return True
+
+    def summary(self) -> str:
+        """
+        Summarize the tally in one line.
+
+        Returns:
+            str: The summary.
+        """
+        host_counts = ", ".join(
+            f"{len(self.host_sets[counter])} {counter}"
+            for counter in ("changed", "failed", "unreachable")
+        )
+        task = f"Task: {self.task} | " if self.task else ""
+        return (
+            f"{task}{len(self.hosts)} host(s), {host_counts} "
+            f"| {self.events} event(s)"
+        )
+
+
+def is_artifact_running(artifact_path: Path) -> bool:
+    """
+    Check if the runner is still writing an artifact.
+
+    The runner writes the 'status' file when the job ends.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        bool: True if the artifact has no final status yet.
+    """
+    return not (artifact_path / "status").is_file()
+
+
+def is_process_alive(pid: int) -> bool:
+    """
+    Check if a local process exists.
+
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        bool: True if the process exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists, but belongs to another user.
+        return True
+    return True
+
+
+def follow_job_events(
+    artifact_path: Path,
+    poll_interval: float = FOLLOW_POLL_INTERVAL,
+    start_timeout: float = FOLLOW_START_TIMEOUT,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Read the job events of an artifact as the runner writes them.
+
+    The event folder is polled until the job ends. Every event file is read
+    once, in counter order.
+
+    A runner that dies never writes the final status, so following also
+    stops when the playbook process named in the events has been gone for
+    FOLLOW_EXIT_GRACE seconds, or when no event arrives within
+    'start_timeout' seconds.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+        poll_interval (float, optional): Seconds between polls.
+            Defaults to FOLLOW_POLL_INTERVAL.
+        start_timeout (float, optional): Seconds to wait for the first
+            event. Defaults to FOLLOW_START_TIMEOUT.
+
+    Yields:
+        Iterator[Dict[str, Any]]: The job events.
+    """
+    seen_counters: Set[int] = set()
+    runner_pid: Optional[int] = None
+    started = last_alive = time.monotonic()
+    while True:
+        # Check the status and the process first, so events written before
+        # the job ended are still read in this poll.
+        finished = not is_artifact_running(artifact_path)
+        runner_alive = runner_pid is None or is_process_alive(runner_pid)
+        new_event_files = sorted(
+            (counter, event_file)
+            for counter, event_file in (
+                report.list_job_events(artifact_path) or []
+            )
+            if counter not in seen_counters
+        )
+        for counter, event_file in new_event_files:
+            event = report.read_job_event(event_file)
+            if event is None:
+                continue
+            seen_counters.add(counter)
+            if isinstance(event.get("pid"), int):
+                runner_pid = event["pid"]
+            yield event
+        if finished:
+            logger.debug("Artifact finished: '%s'", artifact_path)
+            return
+        now = time.monotonic()
+        if runner_alive:
+            last_alive = now
+        elif now - last_alive > FOLLOW_EXIT_GRACE:
+            # The runner writes the status right after the playbook exits.
+            logger.warning(
+                "Runner exited without a final status: '%s'", artifact_path
+            )
+            return
+        if not seen_counters and now - started > start_timeout:
+            logger.warning(
+                "No events after '%s' seconds: '%s'",
+                start_timeout,
+                artifact_path,
+            )
+            return
+        time.sleep(poll_interval)
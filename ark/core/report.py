@@ -1,40 +1,193 @@
 """Ark - Reporting."""
 __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
+import heapq
 import json
 import logging
+import mmap
+import os
 import re
-from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlmodel import Session
+
+from ark.database import get_session, get_write_session, init_db
+from ark.models.artifacts import ArtifactIndex
 from ark.settings import config
-from ark.utils import read_file_contents
+from ark.utils import get_valid_projects, read_file_contents
 
 logger = logging.getLogger(__name__)
 
+INDEX_QUERY_BATCH_SIZE = 500
+# Runner artifacts are folders directly under 'artifacts'; one extra level
+# is searched for artifacts grouped in subfolders.
+ARTIFACT_SEARCH_DEPTH = 2
+ARTIFACT_CONTENT_FOLDERS = {"job_events", "fact_cache"}
+FLEET_SORT_KEYS = ("time", "failures")
+TREND_GROUP_KEYS = ("host", "playbook")
+# Host outcomes of a run, from best to worst.
+HOST_OUTCOMES = ("ok", "failed", "unreachable")
+PLAY_RECAP_MARKER = b"PLAY RECAP"
+ANSI_ESCAPE_REGEX = re.compile(r"\x1b\[[0-9;]*m")
+STATS_EVENT = "playbook_on_stats"
+# The stats event is the last event of a run, but a few verbose output
+# events can follow it.
+STATS_EVENT_SEARCH_LIMIT = 10
+# Recap counters in the stats event, by their name in the stdout recap.
+STATS_EVENT_COUNTERS = {
+    "ok": "ok",
+    "changed": "changed",
+    "unreachable": "dark",
+    "failed": "failures",
+    "skipped": "skipped",
+    "rescued": "rescued",
+    "ignored": "ignored",
+}
+RECORD_FIELDS = (
+    "project",
+    "run_id",
+    "timestamp",
+    "playbook",
+    "host",
+    *STATS_EVENT_COUNTERS,
+)
+
+init_db()
+
+
+class ArtifactFolder(NamedTuple):
+    """Ansible Runner artifact folder found on disk."""
+
+    path: Path
+    mtime: float
+
+
+class ArtifactRecap(NamedTuple):
+    """Parsed recap of an Ansible Runner artifact."""
+
+    path: Path
+    run_id: str
+    playbook: Optional[str]
+    timestamp: datetime
+    status: Optional[str]
+    rc: Optional[int]
+    recaps: List[Dict[str, Dict[str, int]]]
+
+
+class HostRecap(NamedTuple):
+    """Recap of one host in one artifact."""
+
+    project: str
+    run_id: str
+    host: str
+    playbook: Optional[str]
+    timestamp: datetime
+    stats: Dict[str, int]
+
+    @property
+    def failures(self) -> int:
+        """Failed and unreachable count."""
+        return self.stats.get("failed", 0) + self.stats.get("unreachable", 0)
+
+    def as_record(self) -> Dict[str, Any]:
+        """
+        Flatten the recap into a record for machine-readable output.
+
+        Returns:
+            Dict[str, Any]: The record, with the fields in RECORD_FIELDS.
+        """
+        return {
+            "project": self.project,
+            "run_id": self.run_id,
+            "timestamp": self.timestamp.isoformat(),
+            "playbook": self.playbook,
+            "host": self.host,
+            **{
+                counter: self.stats.get(counter, 0)
+                for counter in STATS_EVENT_COUNTERS
+            },
+        }
+
+
+class TrendStats(NamedTuple):
+    """Outcome counts of the host runs of one host or playbook."""
+
+    name: str
+    day: Optional[date]
+    runs: int
+    successful: int
+    failed: int
+    unreachable: int
+    changed: int
+    changed_tasks: int
+
+    @property
+    def success_rate(self) -> float:
+        """Share of host runs without failed or unreachable tasks."""
+        return self.successful / self.runs
+
+    @property
+    def failed_rate(self) -> float:
+        """Share of host runs with failed tasks."""
+        return self.failed / self.runs
+
+    @property
+    def unreachable_rate(self) -> float:
+        """Share of host runs where the host was unreachable."""
+        return self.unreachable / self.runs
+
+    @property
+    def changed_rate(self) -> float:
+        """Share of host runs with changed tasks."""
+        return self.changed / self.runs
+
+    @property
+    def changed_per_run(self) -> float:
+        """Average number of changed tasks per host run."""
+        return self.changed_tasks / self.runs
+
 
 def sort_and_limit_artifacts(
-    artifact_folders: List[Path], last: Optional[int]
-) -> List[Path]:
+    artifact_folders: List[ArtifactFolder], last: Optional[int]
+) -> List[ArtifactFolder]:
     """
     Sort and limit the number of artifacts to display.
 
+    The newest artifacts are selected with a heap, so only 'last' artifacts
+    are ever sorted.
+
     Args:
-        artifact_folders (List[Path]): List of artifact folders.
+        artifact_folders (List[ArtifactFolder]): List of artifact folders.
         last (Optional[int]): The number of artifacts to display.
             Returns all artifacts if None.
 
     Returns:
-        List[Path]: The sorted and limited list of artifact folders.
+        List[ArtifactFolder]: The artifact folders, newest first.
     """
     logger.debug("Sorting and limiting artifacts")
-    artifact_folders.sort(
-        key=lambda folder: folder.stat().st_mtime, reverse=True
-    )
-
-    if 0 < last < len(artifact_folders) if last is not None else False:
-        artifact_folders = artifact_folders[:last]
+    if last is not None and 0 < last < len(artifact_folders):
+        artifact_folders = heapq.nlargest(
+            last, artifact_folders, key=lambda folder: folder.mtime
+        )
+    else:
+        artifact_folders = sorted(
+            artifact_folders, key=lambda folder: folder.mtime, reverse=True
+        )
     logger.debug("Artifacts: %s", artifact_folders)
     return artifact_folders
 
@@ -59,6 +212,40 @@ def extract_play_recaps(content: str) -> List[str]:
     return [recap_tuple[0] for recap_tuple in play_recaps]
 
 
+def read_last_play_recap(stdout_path: Path) -> str:
+    """
+    Read the output from the last play recap to the end of a stdout file.
+
+    The file is memory-mapped and searched backwards from the end, so only
+    the pages after the recap are read and memory use does not depend on
+    the size of the output.
+
+    Args:
+        stdout_path (Path): The path to the stdout file.
+
+    Returns:
+        str: The output from the last 'PLAY RECAP' line, or an empty string
+            if the file has no play recap.
+    """
+    try:
+        with open(stdout_path, "rb") as stdout_file:
+            if os.fstat(stdout_file.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(
+                stdout_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as stdout_map:
+                position = stdout_map.rfind(PLAY_RECAP_MARKER)
+                if position < 0:
+                    return ""
+                tail = stdout_map[position:]
+    except OSError as os_error:
+        logger.error(
+            "Could not read file: %s. Error: '%s'", stdout_path, os_error
+        )
+        return ""
+    return tail.decode(config.ENCODING, errors="replace")
+
+
 def get_artifact_timestamp(stdout_path: Path) -> str:
     """
     Get the timestamp of the artifact.
@@ -119,7 +306,7 @@ def extract_host_stats(recap: str) -> dict[str, dict[str, int]]:
     Returns:
         dict[str, dict[str, int]]: The host stats.
     """
-    lines = recap.strip().split("\n")
+    lines = ANSI_ESCAPE_REGEX.sub("", recap).strip().split("\n")
     host_stats = {}
 
     for line in lines:
@@ -134,7 +321,53 @@ def extract_host_stats(recap: str) -> dict[str, dict[str, int]]:
     return host_stats
 
 
-def find_artifacts(project_name: str) -> List[Path]:
+def scan_artifact_folders(
+    folder: str, depth: int = ARTIFACT_SEARCH_DEPTH
+) -> Iterator[ArtifactFolder]:
+    """
+    Find artifact folders with a pruned directory walk.
+
+    Folders with a 'stdout' file are artifacts and are not searched
+    further, so their job events are never listed. The modification time
+    of an artifact is the newer of its 'stdout' and 'status' times: the
+    runner updates 'status' after the last output, so it changes whenever
+    the recap can change.
+
+    Args:
+        folder (str): The folder to search.
+        depth (int, optional): How many folder levels below 'folder' to
+            search. Defaults to ARTIFACT_SEARCH_DEPTH.
+
+    Yields:
+        Iterator[ArtifactFolder]: The artifact folders.
+    """
+    stdout_mtime: Optional[float] = None
+    status_mtime = 0.0
+    subfolders: List[str] = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name == "stdout" and entry.is_file():
+                    stdout_mtime = entry.stat().st_mtime
+                elif entry.name == "status" and entry.is_file():
+                    status_mtime = entry.stat().st_mtime
+                elif (
+                    depth > 0
+                    and entry.name not in ARTIFACT_CONTENT_FOLDERS
+                    and entry.is_dir(follow_symlinks=False)
+                ):
+                    subfolders.append(entry.path)
+    except (FileNotFoundError, NotADirectoryError, PermissionError) as error:
+        logger.debug("Skipping folder: '%s'. Error: '%s'", folder, error)
+        return
+    if stdout_mtime is not None:
+        yield ArtifactFolder(Path(folder), max(stdout_mtime, status_mtime))
+        return
+    for subfolder in subfolders:
+        yield from scan_artifact_folders(subfolder, depth - 1)
+
+
+def find_artifacts(project_name: str) -> List[ArtifactFolder]:
     """
     Find the artifacts for the project.
 
@@ -142,20 +375,824 @@ def find_artifacts(project_name: str) -> List[Path]:
         project_name (str): The name of the project.
 
     Returns:
-        List[Path]: The list of artifact folders.
+        List[ArtifactFolder]: The list of artifact folders.
     """
     artifact_root_path = Path(config.PROJECTS_DIR) / project_name / "artifacts"
     logger.debug(
         "Checking project for artifact directories: '%s'", project_name
     )
-    artifact_folders = [
-        path
-        for path in artifact_root_path.glob("**")
-        if (path / "stdout").is_file()
-    ]
+    artifact_folders = list(scan_artifact_folders(str(artifact_root_path)))
     logger.debug(
         "Found '%s' artifact directories for project: '%s'",
         len(artifact_folders),
         project_name,
     )
     return artifact_folders
+
+
+def read_artifact_status(artifact_path: Path) -> Optional[str]:
+    """
+    Read the runner status of an artifact.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        Optional[str]: The status, such as 'successful' or 'failed', or None
+            if the runner did not write one.
+    """
+    status_path = artifact_path / "status"
+    if not status_path.is_file():
+        return None
+    return (read_file_contents(status_path) or "").strip() or None
+
+
+def read_artifact_rc(artifact_path: Path) -> Optional[int]:
+    """
+    Read the runner return code of an artifact.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        Optional[int]: The return code, or None if the runner did not
+            write one.
+    """
+    rc_path = artifact_path / "rc"
+    if not rc_path.is_file():
+        return None
+    try:
+        return int((read_file_contents(rc_path) or "").strip())
+    except ValueError:
+        logger.warning("Invalid return code file: '%s'", rc_path)
+        return None
+
+
+def read_artifact_limit(artifact_path: Path) -> Optional[str]:
+    """
+    Read the host limit an artifact was run with.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        Optional[str]: The '--limit' value of the runner command, or None if
+            the run was not limited.
+    """
+    command_path = artifact_path / "command"
+    if not command_path.is_file():
+        return None
+    try:
+        command = json.loads(read_file_contents(command_path) or "")["command"]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Invalid command file: '%s'", command_path)
+        return None
+    if "--limit" not in command[:-1]:
+        return None
+    return str(command[command.index("--limit") + 1]) or None
+
+
+def get_event_counter(event_file_name: str) -> int:
+    """
+    Get the event counter from a runner job event file name.
+
+    Args:
+        event_file_name (str): Event file name. Example: '12-<uuid>.json'.
+
+    Returns:
+        int: The event counter, or -1 for files that are not job events.
+    """
+    counter, _, _ = event_file_name.partition("-")
+    return int(counter) if counter.isdigit() else -1
+
+
+def extract_event_host_stats(
+    event_data: Dict[str, Dict[str, int]]
+) -> Dict[str, Dict[str, int]]:
+    """
+    Extract the host stats from the data of a 'playbook_on_stats' event.
+
+    Args:
+        event_data (Dict[str, Dict[str, int]]): The event data, with one
+            counter mapping of hosts to counts per stat.
+
+    Returns:
+        Dict[str, Dict[str, int]]: The host stats, in the same form and
+            host order as extract_host_stats.
+    """
+    hosts: Set[str] = set()
+    for event_counter in STATS_EVENT_COUNTERS.values():
+        hosts.update(event_data.get(event_counter) or {})
+    hosts.update(event_data.get("processed") or {})
+    return {
+        host: {
+            stat: int((event_data.get(event_counter) or {}).get(host, 0))
+            for stat, event_counter in STATS_EVENT_COUNTERS.items()
+        }
+        for host in sorted(hosts)
+    }
+
+
+def list_job_events(artifact_path: Path) -> Optional[List[Tuple[int, str]]]:
+    """
+    List the job event files of an artifact.
+
+    Partial and temporary files the runner writes while a job runs are
+    skipped.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        Optional[List[Tuple[int, str]]]: Event counter and path of each
+            event file, unsorted, or None if the artifact has no job events.
+    """
+    try:
+        with os.scandir(artifact_path / "job_events") as entries:
+            event_files = [
+                (get_event_counter(entry.name), entry.path)
+                for entry in entries
+                if entry.name.endswith(".json")
+            ]
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return [
+        (counter, event_file)
+        for counter, event_file in event_files
+        if counter >= 0 and not event_file.endswith("-partial.json")
+    ]
+
+
+def read_job_event(event_file: str) -> Optional[Dict[str, Any]]:
+    """
+    Read a runner job event file.
+
+    Args:
+        event_file (str): Path to the event file.
+
+    Returns:
+        Optional[Dict[str, Any]]: The event, or None if it is unreadable.
+    """
+    content = read_file_contents(event_file)
+    try:
+        event: Dict[str, Any] = json.loads(content or "")
+    except json.JSONDecodeError:
+        logger.debug("Skipping unreadable job event: '%s'", event_file)
+        return None
+    return event
+
+
+def read_event_recap(
+    artifact_path: Path,
+) -> Optional[Dict[str, Dict[str, int]]]:
+    """
+    Read the recap from the runner's 'playbook_on_stats' job event.
+
+    Only the names of the job event files are listed; the newest events are
+    read until the stats event is found, so the cost does not depend on the
+    size of the playbook output.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        Optional[Dict[str, Dict[str, int]]]: The host stats, or None if the
+            artifact has no stats event.
+    """
+    event_files = list_job_events(artifact_path)
+    if event_files is None:
+        return None
+    event_files.sort(reverse=True)
+    for _, event_file in event_files[:STATS_EVENT_SEARCH_LIMIT]:
+        event = read_job_event(event_file)
+        if event and event.get("event") == STATS_EVENT:
+            return extract_event_host_stats(event.get("event_data") or {})
+    logger.debug("No stats event found in: '%s'", artifact_path)
+    return None
+
+
+def parse_artifact(artifact_path: Path) -> ArtifactRecap:
+    """
+    Parse the recaps of an artifact from its files.
+
+    The recap is read from the runner's stats job event. Artifacts without
+    job events fall back to the last play recap in 'stdout'.
+
+    Args:
+        artifact_path (Path): The artifact folder.
+
+    Returns:
+        ArtifactRecap: The parsed artifact.
+    """
+    stdout_path = artifact_path / "stdout"
+    logger.debug("Parsing artifact: '%s'", artifact_path)
+    event_recap = read_event_recap(artifact_path)
+    if event_recap is not None:
+        recaps = [event_recap]
+    else:
+        logger.debug("Reading play recap from: '%s'", stdout_path)
+        content = read_last_play_recap(stdout_path)
+        recaps = [
+            extract_host_stats(recap)
+            for recap in extract_play_recaps(content)
+        ]
+    return ArtifactRecap(
+        path=artifact_path,
+        run_id=artifact_path.name,
+        playbook=extract_playbook_name_from_file(
+            str(artifact_path / "command")
+        ),
+        timestamp=datetime.fromtimestamp(stdout_path.stat().st_mtime),
+        status=read_artifact_status(artifact_path),
+        rc=read_artifact_rc(artifact_path),
+        recaps=recaps,
+    )
+
+
+@get_session
+def get_indexed_artifacts(
+    artifact_paths: List[Path],
+    session: Optional[Session] = None,
+) -> Dict[str, Tuple[float, ArtifactRecap]]:
+    """
+    Get indexed artifacts.
+
+    Args:
+        artifact_paths (List[Path]): Artifact folders to look up.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+
+    Returns:
+        Dict[str, Tuple[float, ArtifactRecap]]: Indexed modification time
+            and recap by absolute artifact path.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    paths = {str(path.absolute()): path for path in artifact_paths}
+    path_keys = list(paths)
+    indexed_artifacts: Dict[str, Tuple[float, ArtifactRecap]] = {}
+    for start in range(0, len(path_keys), INDEX_QUERY_BATCH_SIZE):
+        for row in session.query(ArtifactIndex).filter(
+            ArtifactIndex.path.in_(  # type: ignore
+                path_keys[start : start + INDEX_QUERY_BATCH_SIZE]
+            )
+        ):
+            indexed_artifacts[row.path] = (
+                row.mtime,
+                ArtifactRecap(
+                    path=paths[row.path],
+                    run_id=row.run_id,
+                    playbook=row.playbook,
+                    timestamp=row.timestamp,
+                    status=row.status,
+                    rc=row.rc,
+                    recaps=row.recaps,
+                ),
+            )
+    return indexed_artifacts
+
+
+@get_write_session
+def store_artifact_index(
+    project_name: str,
+    artifacts: Iterable[Tuple[float, ArtifactRecap]],
+    session: Optional[Session] = None,
+) -> None:
+    """
+    Add or replace artifacts in the artifact index.
+
+    New artifacts usually mean the runner rotated old ones away, so entries
+    of deleted artifacts are removed in the same transaction.
+
+    Args:
+        project_name (str): The name of the project.
+        artifacts (Iterable[Tuple[float, ArtifactRecap]]): Modification time
+            and parsed recap of each artifact.
+        session (Optional[Session], optional): Database session.
+            Defaults to None.
+
+    Raises:
+        ValueError: Session is required.
+    """
+    if not session:
+        raise ValueError("Session is required.")
+
+    rows = [
+        {
+            "project": project_name,
+            "path": str(artifact.path.absolute()),
+            "mtime": mtime,
+            "run_id": artifact.run_id,
+            "playbook": artifact.playbook,
+            "timestamp": artifact.timestamp,
+            "status": artifact.status,
+            "rc": artifact.rc,
+            "host_stats": json.dumps(artifact.recaps),
+        }
+        for mtime, artifact in artifacts
+    ]
+    path_keys = [row["path"] for row in rows]
+    for start in range(0, len(path_keys), INDEX_QUERY_BATCH_SIZE):
+        session.query(ArtifactIndex).filter(
+            ArtifactIndex.path.in_(  # type: ignore
+                path_keys[start : start + INDEX_QUERY_BATCH_SIZE]
+            )
+        ).delete(synchronize_session=False)
+    prune_artifact_index(project_name, session)
+    session.execute(ArtifactIndex.__table__.insert(), rows)  # type: ignore
+    session.commit()
+    logger.debug(
+        "Indexed '%s' artifacts for project: '%s'", len(rows), project_name
+    )
+
+
+def prune_artifact_index(project_name: str, session: Session) -> int:
+    """
+    Remove index entries of artifacts that no longer exist, such as
+    artifacts removed by the runner's artifact rotation.
+
+    Args:
+        project_name (str): The name of the project.
+        session (Session): Database session.
+
+    Returns:
+        int: Number of removed entries.
+    """
+    stale_ids = [
+        row_id
+        for row_id, path in session.query(
+            ArtifactIndex.id, ArtifactIndex.path
+        ).filter(ArtifactIndex.project == project_name)
+        if not (Path(path) / "stdout").is_file()
+    ]
+    for start in range(0, len(stale_ids), INDEX_QUERY_BATCH_SIZE):
+        session.query(ArtifactIndex).filter(
+            ArtifactIndex.id.in_(  # type: ignore
+                stale_ids[start : start + INDEX_QUERY_BATCH_SIZE]
+            )
+        ).delete(synchronize_session=False)
+    if stale_ids:
+        logger.debug(
+            "Removing '%s' deleted artifacts from the index of project: '%s'",
+            len(stale_ids),
+            project_name,
+        )
+    return len(stale_ids)
+
+
+def load_artifact_recaps(
+    project_name: str, artifact_folders: List[ArtifactFolder]
+) -> List[ArtifactRecap]:
+    """
+    Load the recaps of a project's artifacts.
+
+    Args:
+        project_name (str): The name of the project.
+        artifact_folders (List[ArtifactFolder]): The artifact folders to
+            load.
+
+    Returns:
+        List[ArtifactRecap]: The recaps, in the order of artifact_folders.
+    """
+    return load_project_recaps({project_name: artifact_folders})[
+        project_name
+    ]
+
+
+def load_project_recaps(
+    artifact_folders: Dict[str, List[ArtifactFolder]],
+    parallel: bool = False,
+) -> Dict[str, List[ArtifactRecap]]:
+    """
+    Load the recaps of artifacts, parsing only new or changed artifacts.
+
+    Args:
+        artifact_folders (Dict[str, List[ArtifactFolder]]): The artifact
+            folders to load by project name.
+        parallel (bool, optional): Parse artifacts in a thread pool.
+            Defaults to False.
+
+    Returns:
+        Dict[str, List[ArtifactRecap]]: The recaps by project name, in the
+            order of artifact_folders.
+    """
+    artifacts: Dict[str, List[ArtifactRecap]] = {
+        project_name: [] for project_name in artifact_folders
+    }
+    for project_name, artifact in iter_project_recaps(
+        artifact_folders, parallel=parallel
+    ):
+        artifacts[project_name].append(artifact)
+    return artifacts
+
+
+def iter_project_recaps(
+    artifact_folders: Dict[str, List[ArtifactFolder]],
+    parallel: bool = False,
+) -> Iterator[Tuple[str, ArtifactRecap]]:
+    """
+    Load the recaps of artifacts one by one, in order.
+
+    Recaps are read from the artifact index. Artifacts that are missing
+    from the index, or whose files changed since they were indexed, are
+    parsed and indexed once all recaps have been yielded. If the index
+    table does not exist yet, every artifact is parsed. The index is read
+    and written in the calling thread; only parsing runs in the thread
+    pool.
+
+    Args:
+        artifact_folders (Dict[str, List[ArtifactFolder]]): The artifact
+            folders to load by project name.
+        parallel (bool, optional): Parse artifacts in a thread pool.
+            Defaults to False.
+
+    Yields:
+        Iterator[Tuple[str, ArtifactRecap]]: Project name and recap of
+            each artifact, in the order of artifact_folders.
+    """
+    indexed_artifacts: Optional[Dict[str, Tuple[float, ArtifactRecap]]]
+    try:
+        indexed_artifacts = get_indexed_artifacts(
+            [
+                folder.path
+                for folders in artifact_folders.values()
+                for folder in folders
+            ]
+        )
+    except (OperationalError, ProgrammingError) as error:
+        logger.info("Artifact index is not available: '%s'", error)
+        indexed_artifacts = None
+
+    def is_indexed(folder: ArtifactFolder) -> bool:
+        """Check if the index has the current recap of an artifact."""
+        indexed_mtime, _ = (indexed_artifacts or {}).get(
+            str(folder.path.absolute()), (None, None)
+        )
+        return indexed_mtime == folder.mtime
+
+    stale_paths = [
+        folder.path
+        for folders in artifact_folders.values()
+        for folder in folders
+        if not is_indexed(folder)
+    ]
+    executor = (
+        ThreadPoolExecutor() if parallel and len(stale_paths) > 1 else None
+    )
+    parsed_artifacts: Dict[str, List[Tuple[float, ArtifactRecap]]] = {}
+    try:
+        parsed = (executor.map if executor else map)(
+            parse_artifact, stale_paths
+        )
+        for project_name, folders in artifact_folders.items():
+            for folder in folders:
+                if is_indexed(folder):
+                    _, artifact = (indexed_artifacts or {})[
+                        str(folder.path.absolute())
+                    ]
+                else:
+                    artifact = next(parsed)
+                    parsed_artifacts.setdefault(project_name, []).append(
+                        (folder.mtime, artifact)
+                    )
+                yield project_name, artifact
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    if indexed_artifacts is not None:
+        for project_name, project_artifacts in parsed_artifacts.items():
+            try:
+                store_artifact_index(project_name, project_artifacts)
+            except IntegrityError as error:
+                # Another report indexed the same artifacts concurrently.
+                logger.debug("Artifact index not updated: '%s'", error)
+    logger.debug(
+        "Loaded '%s' artifacts, parsed '%s'",
+        sum(len(folders) for folders in artifact_folders.values()),
+        len(stale_paths),
+    )
+
+
+def iter_host_recaps(
+    artifacts: Iterable[Tuple[str, ArtifactRecap]]
+) -> Iterator[HostRecap]:
+    """
+    Split artifact recaps into host recaps.
+
+    Args:
+        artifacts (Iterable[Tuple[str, ArtifactRecap]]): Project name and
+            recap of each artifact.
+
+    Yields:
+        Iterator[HostRecap]: The host recaps, in artifact order.
+    """
+    for project_name, artifact in artifacts:
+        for host_stats in artifact.recaps:
+            for host, stats in host_stats.items():
+                yield HostRecap(
+                    project_name,
+                    artifact.run_id,
+                    host,
+                    artifact.playbook,
+                    artifact.timestamp,
+                    stats,
+                )
+
+
+def find_fleet_artifacts(
+    last: Optional[int] = None,
+) -> Dict[str, List[ArtifactFolder]]:
+    """
+    Find the artifacts of every valid project in parallel.
+
+    Args:
+        last (Optional[int], optional): The number of newest artifacts to
+            select per project. Selects all artifacts if None.
+
+    Returns:
+        Dict[str, List[ArtifactFolder]]: The artifact folders by project
+            name, newest first.
+    """
+
+    def find_project_artifacts(project_name: str) -> List[ArtifactFolder]:
+        """Find and select the artifacts of one project."""
+        return sort_and_limit_artifacts(find_artifacts(project_name), last)
+
+    projects = sorted(get_valid_projects())
+    logger.debug("Finding artifacts for projects: '%s'", projects)
+    with ThreadPoolExecutor() as executor:
+        return dict(
+            zip(projects, executor.map(find_project_artifacts, projects))
+        )
+
+
+def merge_host_recaps(
+    artifacts: Dict[str, List[ArtifactRecap]], sort_by: str = "time"
+) -> List[HostRecap]:
+    """
+    Merge the host recaps of many artifacts into one list.
+
+    Args:
+        artifacts (Dict[str, List[ArtifactRecap]]): Artifact recaps by
+            project name.
+        sort_by (str, optional): 'time' for the newest recaps first or
+            'failures' for the most failed and unreachable tasks first.
+            Defaults to "time".
+
+    Raises:
+        ValueError: Unknown sort key.
+
+    Returns:
+        List[HostRecap]: The host recaps.
+    """
+    if sort_by not in FLEET_SORT_KEYS:
+        raise ValueError(
+            f"Invalid sort key: '{sort_by}'. "
+            f"Expected one of: {', '.join(FLEET_SORT_KEYS)}"
+        )
+    host_recaps = list(
+        iter_host_recaps(
+            (project_name, artifact)
+            for project_name, project_artifacts in artifacts.items()
+            for artifact in project_artifacts
+        )
+    )
+    host_recaps.sort(key=lambda recap: recap.timestamp, reverse=True)
+    if sort_by == "failures":
+        host_recaps.sort(key=lambda recap: recap.failures, reverse=True)
+    return host_recaps
+
+
+def compute_trends(
+    artifacts: Iterable[ArtifactRecap],
+    group_by: str = "host",
+    daily: bool = False,
+) -> List[TrendStats]:
+    """
+    Compute run outcome rates per host or playbook.
+
+    Every host in every recap is one host run. Counts are summed in a
+    single pass over the recap counters.
+
+    Args:
+        artifacts (Iterable[ArtifactRecap]): The artifact recaps.
+        group_by (str, optional): 'host' or 'playbook'. Defaults to "host".
+        daily (bool, optional): Count each day separately.
+            Defaults to False.
+
+    Raises:
+        ValueError: Unknown group key.
+
+    Returns:
+        List[TrendStats]: The trends, by name and day. Without daily
+            buckets, the least successful come first.
+    """
+    if group_by not in TREND_GROUP_KEYS:
+        raise ValueError(
+            f"Invalid group key: '{group_by}'. "
+            f"Expected one of: {', '.join(TREND_GROUP_KEYS)}"
+        )
+    counters: Dict[Tuple[str, Optional[date]], List[int]] = defaultdict(
+        lambda: [0] * 6
+    )
+    for artifact in artifacts:
+        day = artifact.timestamp.date() if daily else None
+        for host_stats in artifact.recaps:
+            for host, stats in host_stats.items():
+                name = host if group_by == "host" else artifact.playbook
+                failed = stats.get("failed", 0) > 0
+                unreachable = stats.get("unreachable", 0) > 0
+                changed_tasks = stats.get("changed", 0)
+                counter = counters[(name or "-", day)]
+                counter[0] += 1
+                counter[1] += not (failed or unreachable)
+                counter[2] += failed
+                counter[3] += unreachable
+                counter[4] += changed_tasks > 0
+                counter[5] += changed_tasks
+    trends = [
+        TrendStats(name, day, *counter)
+        for (name, day), counter in counters.items()
+    ]
+    if daily:
+        trends.sort(key=lambda trend: (trend.name, trend.day))
+    else:
+        trends.sort(key=lambda trend: (trend.success_rate, trend.name))
+    return trends
+
+
+def get_host_outcome(stats: Dict[str, int]) -> str:
+    """
+    Get the outcome of a host run from its recap counters.
+
+    Args:
+        stats (Dict[str, int]): The recap counters of the host.
+
+    Returns:
+        str: 'unreachable', 'failed' or 'ok'.
+    """
+    if stats.get("unreachable", 0):
+        return "unreachable"
+    if stats.get("failed", 0):
+        return "failed"
+    return "ok"
+
+
+def get_host_outcomes(artifact: ArtifactRecap) -> Dict[str, str]:
+    """
+    Get the outcome of every host in an artifact.
+
+    A host in more than one recap gets its worst outcome.
+
+    Args:
+        artifact (ArtifactRecap): The artifact recap.
+
+    Returns:
+        Dict[str, str]: Outcome by host.
+    """
+    outcomes: Dict[str, str] = {}
+    for host_stats in artifact.recaps:
+        for host, stats in host_stats.items():
+            outcome = get_host_outcome(stats)
+            current_outcome = outcomes.get(host)
+            if current_outcome is None or HOST_OUTCOMES.index(
+                outcome
+            ) > HOST_OUTCOMES.index(current_outcome):
+                outcomes[host] = outcome
+    return outcomes
+
+
+def get_failed_hosts(artifact: ArtifactRecap) -> List[str]:
+    """
+    Get the hosts of an artifact that failed or were unreachable.
+
+    Args:
+        artifact (ArtifactRecap): The artifact recap.
+
+    Returns:
+        List[str]: The host names, sorted.
+    """
+    return sorted(
+        host
+        for host, outcome in get_host_outcomes(artifact).items()
+        if outcome != "ok"
+    )
+
+
+def diff_host_outcomes(
+    before: ArtifactRecap, after: ArtifactRecap
+) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Find the hosts whose outcome changed between two runs.
+
+    Args:
+        before (ArtifactRecap): The earlier run.
+        after (ArtifactRecap): The later run.
+
+    Returns:
+        List[Tuple[str, Optional[str], Optional[str]]]: Host, outcome
+            before and outcome after, sorted by host. The outcome is None
+            if the host was not part of a run.
+    """
+    before_outcomes = get_host_outcomes(before)
+    after_outcomes = get_host_outcomes(after)
+    changed_hosts = before_outcomes.keys() ^ after_outcomes.keys()
+    changed_hosts |= {
+        host
+        for host in before_outcomes.keys() & after_outcomes.keys()
+        if before_outcomes[host] != after_outcomes[host]
+    }
+    return [
+        (host, before_outcomes.get(host), after_outcomes.get(host))
+        for host in sorted(changed_hosts)
+    ]
+
+
+def find_artifact(
+    artifact_folders: List[ArtifactFolder], artifact_id: str
+) -> Optional[ArtifactFolder]:
+    """
+    Find an artifact folder by run id or path.
+
+    Args:
+        artifact_folders (List[ArtifactFolder]): The artifact folders.
+        artifact_id (str): Run id (the folder name) or folder path.
+
+    Returns:
+        Optional[ArtifactFolder]: The artifact folder, or None if it was not
+            found.
+    """
+    artifact_path = str(Path(artifact_id).absolute())
+    for folder in artifact_folders:
+        if artifact_id == folder.path.name or artifact_path == str(
+            folder.path.absolute()
+        ):
+            return folder
+    return None
+
+
+def find_previous_run(
+    artifacts: List[ArtifactRecap],
+) -> Optional[Tuple[ArtifactRecap, ArtifactRecap]]:
+    """
+    Find the newest run and the run of the same playbook before it.
+
+    Args:
+        artifacts (List[ArtifactRecap]): The artifact recaps, newest first.
+
+    Returns:
+        Optional[Tuple[ArtifactRecap, ArtifactRecap]]: The previous and the
+            newest run, or None if the newest playbook has no previous run.
+    """
+    if not artifacts:
+        return None
+    newest = artifacts[0]
+    for artifact in artifacts[1:]:
+        if artifact.playbook == newest.playbook:
+            return artifact, newest
+    return None
+
+
+def merge_artifact_recaps(artifacts: List[ArtifactRecap]) -> ArtifactRecap:
+    """
+    Merge the artifacts of one sharded run into a single recap.
+
+    Counters of hosts in more than one artifact are added up. The merged
+    run is successful only if every artifact is; otherwise it gets the
+    first other status and the highest return code.
+
+    Args:
+        artifacts (List[ArtifactRecap]): The artifacts of the shards.
+
+    Returns:
+        ArtifactRecap: The merged recap, with the path of the first artifact
+            and the run ids of all artifacts.
+    """
+    host_stats: Dict[str, Dict[str, int]] = {}
+    for artifact in artifacts:
+        for recap in artifact.recaps:
+            for host, stats in recap.items():
+                merged = host_stats.setdefault(host, {})
+                for counter, count in stats.items():
+                    merged[counter] = merged.get(counter, 0) + count
+    statuses = [artifact.status for artifact in artifacts]
+    return_codes = [
+        artifact.rc for artifact in artifacts if artifact.rc is not None
+    ]
+    return ArtifactRecap(
+        path=artifacts[0].path,
+        run_id=",".join(artifact.run_id for artifact in artifacts),
+        playbook=artifacts[0].playbook,
+        timestamp=max(artifact.timestamp for artifact in artifacts),
+        status=next(
+            (status for status in statuses if status != "successful"),
+            "successful",
+        ),
+        rc=max(return_codes) if return_codes else None,
+        recaps=[{host: host_stats[host] for host in sorted(host_stats)}],
+    )
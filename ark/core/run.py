@@ -2,15 +2,37 @@
 __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
 import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, List, Optional
+from threading import Thread
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import ansible_runner
+import yaml
 
+from ark.core.profile import TaskResultRecorder, prune_task_results
 from ark.settings import config
+from ark.utils import read_file_contents, validate_project_dir
 
 logger = logging.getLogger(__name__)
 
+RUN_POLL_INTERVAL = 0.5  # Seconds
+LIMIT_DIR_PREFIX = "ark-limits-"
+
 
 def find_playbooks(project_name: str) -> List[str]:
     """
@@ -89,6 +111,68 @@ def prepare_extra_vars(extra_vars: str) -> dict[str, str]:
     return extra_vars_dict
 
 
+def get_fact_cache_type(project_name: str) -> str:
+    """
+    Get the fact cache plugin selected in a project's 'env/envvars'.
+
+    ansible-runner overrides ANSIBLE_CACHE_PLUGIN with 'jsonfile' unless
+    another fact cache type is passed explicitly.
+
+    Args:
+        project_name (str): Project name.
+
+    Returns:
+        str: Fact cache plugin name. Defaults to 'jsonfile'.
+    """
+    envvars_path = Path(config.PROJECTS_DIR) / project_name / "env" / "envvars"
+    content = (
+        read_file_contents(envvars_path) if envvars_path.is_file() else None
+    )
+    envvars = yaml.safe_load(content or "") or {}
+    fact_cache_type = str(envvars.get("ANSIBLE_CACHE_PLUGIN", "jsonfile"))
+    logger.debug("Fact cache type: '%s'", fact_cache_type)
+    return fact_cache_type
+
+
+def get_runner_kwargs(  # pylint: disable=too-many-arguments
+    project_name: str,
+    playbook_path: Path,
+    rotate_artifacts: int,
+    limit: str,
+    extra_vars_dict: dict[str, str],
+    verbosity: int = 0,
+) -> Dict[str, Any]:
+    """
+    Get the ansible-runner arguments to run a project's playbook.
+
+    Extra vars are only passed on the command line. The runner would
+    otherwise write the first extra vars it gets to the project's
+    'env/extravars', which every later and concurrent run of the project
+    then reads as well.
+
+    Args:
+        project_name (str): Project name.
+        playbook_path (Path): Path to the playbook.
+        rotate_artifacts (int): Artifact rotation limit.
+        limit (str): Ansible limit.
+        extra_vars_dict (dict[str, str]): Extra vars.
+        verbosity (int, optional): Ansible verbosity. Defaults to 0.
+
+    Returns:
+        Dict[str, Any]: Keyword arguments for ansible_runner.run.
+    """
+    return {
+        "private_data_dir": Path(config.PROJECTS_DIR) / project_name,
+        "playbook": str(playbook_path),
+        "rotate_artifacts": rotate_artifacts,
+        "limit": limit,
+        "extravars": extra_vars_dict if extra_vars_dict else None,
+        "verbosity": verbosity,
+        "fact_cache_type": get_fact_cache_type(project_name),
+        "suppress_env_files": True,
+    }
+
+
 def run_ansible_playbook(  # pylint: disable=too-many-arguments
     project_name: str,
     playbook_path: Path,
@@ -96,6 +180,8 @@ def run_ansible_playbook(  # pylint: disable=too-many-arguments
     limit: str,
     extra_vars_dict: dict[str, str],
     verbosity: int = 0,
+    event_handler: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    quiet: bool = False,
 ) -> Any:
     """
     Run an Ansible playbook.
@@ -106,6 +192,14 @@ def run_ansible_playbook(  # pylint: disable=too-many-arguments
         limit (str): Ansible limit.
         extra_vars_dict (dict[str, str]): Extra vars.
         verbosity (int, optional): Ansible verbosity. Defaults to 0.
+        event_handler (Optional[Callable[[Dict[str, Any]], bool]], optional):
+            Called with every runner event as it happens. Events are only
+            written to the artifact if it returns True. Defaults to None.
+        quiet (bool, optional): Do not echo the playbook output.
+            Defaults to False.
+
+    Task results are recorded for 'ark run profile' as the run goes. Those
+    of artifacts removed by the rotation are removed after the run.
 
     Returns:
         Any: Ansible runner result.
@@ -118,15 +212,29 @@ def run_ansible_playbook(  # pylint: disable=too-many-arguments
         rotate_artifacts,
         extra_vars_dict or "None",
     )
-    private_data_dir = Path(config.PROJECTS_DIR) / project_name
-    result = ansible_runner.run(
-        private_data_dir=private_data_dir,
-        playbook=str(playbook_path),
-        rotate_artifacts=rotate_artifacts,
-        limit=limit,
-        extravars=extra_vars_dict if extra_vars_dict else None,
-        verbosity=verbosity,
-    )
+    recorder = TaskResultRecorder(project_name)
+
+    def handle_event(event: Dict[str, Any]) -> bool:
+        recorder.handle_event(event)
+        return event_handler(event) if event_handler else True
+
+    try:
+        result = ansible_runner.run(
+            **get_runner_kwargs(
+                project_name,
+                playbook_path,
+                rotate_artifacts,
+                limit,
+                extra_vars_dict,
+                verbosity,
+            ),
+            event_handler=handle_event,
+            quiet=quiet,
+        )
+    finally:
+        recorder.flush()
+    if rotate_artifacts:
+        prune_task_results(project_name)
 
     if result.status != "successful":
         logger.error(
@@ -136,3 +244,402 @@ def run_ansible_playbook(  # pylint: disable=too-many-arguments
         logger.info("Playbook completed successfully: '%s'", playbook_path)
     logger.debug("Playbook result: %s", result.status)
     return result
+
+
+class RunJob(NamedTuple):
+    """A playbook run of a run manifest."""
+
+    project: str
+    playbook: str
+    limit: str = ""
+    extra_vars: Dict[str, str] = {}
+
+    @property
+    def name(self) -> str:
+        """Short job description for output and logs."""
+        name = f"{self.project}/{self.playbook}"
+        return f"{name} (limit: {self.limit})" if self.limit else name
+
+
+class RunJobResult(NamedTuple):
+    """Outcome of a playbook run started by run_many."""
+
+    job: RunJob
+    status: str
+    rc: Optional[int]
+    artifact_dir: Optional[str]
+    elapsed: float
+
+
+def parse_run_job(entry: Any) -> RunJob:
+    """
+    Parse and validate a run manifest entry.
+
+    Args:
+        entry (Any): The manifest entry, a mapping with 'project' and
+            'playbook' and optionally 'limit' and 'extra_vars'.
+
+    Raises:
+        ValueError: If the entry is invalid, or the project or playbook
+            does not exist.
+
+    Returns:
+        RunJob: The job.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"Manifest entry is not a mapping: {entry!r}")
+    unknown_keys = set(entry) - set(RunJob._fields)
+    if unknown_keys:
+        raise ValueError(f"Unknown manifest keys: {sorted(unknown_keys)}")
+    project = str(entry.get("project") or "")
+    playbook = str(entry.get("playbook") or "")
+    if not project or not playbook:
+        raise ValueError(
+            f"Manifest entry needs a project and a playbook: {entry!r}"
+        )
+    if validate_project_dir(str(Path(config.PROJECTS_DIR) / project)):
+        raise ValueError(f"Project is missing or incomplete: '{project}'")
+    if get_playbook_path(project, playbook) is None:
+        raise ValueError(
+            f"Playbook '{playbook}' not found in project '{project}'"
+        )
+    extra_vars = entry.get("extra_vars") or {}
+    if isinstance(extra_vars, str):
+        extra_vars = prepare_extra_vars(extra_vars)
+    elif not isinstance(extra_vars, dict):
+        raise ValueError(f"Invalid extra_vars: {extra_vars!r}")
+    return RunJob(
+        project=project,
+        playbook=playbook,
+        limit=str(entry.get("limit") or ""),
+        extra_vars={str(key): str(value) for key, value in extra_vars.items()},
+    )
+
+
+def load_run_manifest(manifest_path: Path) -> List[RunJob]:
+    """
+    Load the jobs of a run manifest.
+
+    The manifest is a YAML (or JSON) list of entries with a 'project', a
+    'playbook' and optionally a 'limit' and 'extra_vars', either a mapping
+    or 'key=value' pairs separated by commas.
+
+    Args:
+        manifest_path (Path): Path to the manifest.
+
+    Raises:
+        ValueError: If the manifest or one of its entries is invalid.
+
+    Returns:
+        List[RunJob]: The jobs, in manifest order.
+    """
+    content = read_file_contents(manifest_path)
+    if content is None:
+        raise ValueError(f"Could not read manifest: '{manifest_path}'")
+    try:
+        entries = yaml.safe_load(content)
+    except yaml.YAMLError as error:
+        raise ValueError(f"Invalid manifest: {error}") from error
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("The manifest must be a non-empty list of jobs.")
+    jobs = [parse_run_job(entry) for entry in entries]
+    logger.info(
+        "Loaded '%s' jobs from manifest: '%s'", len(jobs), manifest_path
+    )
+    return jobs
+
+
+def remove_old_artifacts(
+    project_name: str, keep: int, protected_paths: Set[str]
+) -> None:
+    """
+    Remove the oldest artifacts of a project, like the runner's rotation.
+
+    The recorded task results of removed artifacts are removed too.
+
+    Args:
+        project_name (str): Project name.
+        keep (int): Number of artifacts to keep.
+        protected_paths (Set[str]): Real paths of artifacts that must not
+            be removed, such as those of running jobs.
+    """
+    artifacts_path = Path(config.PROJECTS_DIR) / project_name / "artifacts"
+    artifacts = []
+    with os.scandir(artifacts_path) as entries:
+        for entry in entries:
+            try:
+                artifacts.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    artifacts.sort()
+    removed = False
+    for _, artifact_path in artifacts[: max(0, len(artifacts) - keep)]:
+        if os.path.realpath(artifact_path) in protected_paths:
+            continue
+        logger.debug("Removing old artifact: '%s'", artifact_path)
+        shutil.rmtree(artifact_path, ignore_errors=True)
+        removed = True
+    if removed:
+        prune_task_results(project_name)
+
+
+def start_job(job: RunJob) -> Tuple[Thread, Any, TaskResultRecorder]:
+    """
+    Start a playbook run in the background.
+
+    The runner's artifact rotation is disabled, see run_many. Task results
+    are recorded for 'ark run profile' as the run goes; flush the recorder
+    when the thread ends.
+
+    Args:
+        job (RunJob): The job to start.
+
+    Returns:
+        Tuple[Thread, Any, TaskResultRecorder]: The runner thread, the
+            ansible-runner Runner and the task result recorder.
+    """
+    playbook_path = (
+        Path(config.PROJECTS_DIR) / job.project / "project" / job.playbook
+    )
+    logger.info("Starting job: %s", job.name)
+    recorder = TaskResultRecorder(job.project)
+    thread, runner = ansible_runner.run_async(
+        **get_runner_kwargs(
+            job.project,
+            playbook_path,
+            0,
+            job.limit,
+            job.extra_vars,
+        ),
+        event_handler=recorder.handle_event,
+        quiet=True,
+    )
+    return thread, runner, recorder
+
+
+def run_many(
+    jobs: List[RunJob],
+    max_jobs: int,
+    max_project_jobs: int,
+    rotate_artifacts: int,
+    on_finish: Optional[Callable[[RunJobResult], None]] = None,
+) -> List[RunJobResult]:
+    """
+    Run many playbooks concurrently.
+
+    Jobs start in order whenever fewer than 'max_jobs' jobs run in total and
+    fewer than 'max_project_jobs' run for the job's project; a job whose
+    project is at its cap does not hold back jobs of other projects. The
+    playbook output is not echoed.
+
+    The runner rotates artifacts from the job's thread, so concurrent jobs
+    of a project would remove the same folders at the same time. Artifacts
+    are rotated here instead, when each job starts and once more per
+    project after all jobs end, and the artifacts of running jobs are never
+    removed.
+
+    Args:
+        jobs (List[RunJob]): The jobs to run.
+        max_jobs (int): Maximum number of concurrent jobs.
+        max_project_jobs (int): Maximum number of concurrent jobs per
+            project.
+        rotate_artifacts (int): Artifact rotation limit.
+        on_finish (Optional[Callable[[RunJobResult], None]], optional):
+            Called with each result as its job ends. Defaults to None.
+
+    Returns:
+        List[RunJobResult]: The job results, in job order.
+    """
+    pending = list(enumerate(jobs))
+    running: Dict[int, Tuple[Thread, Any, TaskResultRecorder, float]] = {}
+    project_jobs: Dict[str, int] = {}
+    results: Dict[int, RunJobResult] = {}
+
+    def finish(index: int, result: RunJobResult) -> None:
+        results[index] = result
+        if on_finish:
+            on_finish(result)
+
+    while pending or running:
+        for index, job in list(pending):
+            if len(running) >= max_jobs:
+                break
+            if project_jobs.get(job.project, 0) >= max_project_jobs:
+                continue
+            pending.remove((index, job))
+            start_time = time.monotonic()
+            try:
+                thread, runner, recorder = start_job(job)
+            except Exception as error:  # pylint: disable=broad-except
+                logger.error("Could not start job %s: %s", job.name, error)
+                finish(index, RunJobResult(job, "error", None, None, 0.0))
+                continue
+            running[index] = (thread, runner, recorder, start_time)
+            project_jobs[job.project] = project_jobs.get(job.project, 0) + 1
+            remove_old_artifacts(
+                job.project,
+                rotate_artifacts,
+                {
+                    os.path.realpath(running_runner.config.artifact_dir)
+                    for _, running_runner, _, _ in running.values()
+                },
+            )
+
+        time.sleep(RUN_POLL_INTERVAL)
+        for index, (thread, runner, recorder, start_time) in list(
+            running.items()
+        ):
+            if thread.is_alive():
+                continue
+            del running[index]
+            # The runner skips its finished callback when the run raises,
+            # so the last task results are stored here.
+            recorder.flush()
+            job = jobs[index]
+            project_jobs[job.project] -= 1
+            result = RunJobResult(
+                job,
+                # A runner that raised never sets a final status.
+                "error"
+                if runner.status in ("unstarted", "starting", "running")
+                else runner.status,
+                runner.rc,
+                runner.config.artifact_dir,
+                time.monotonic() - start_time,
+            )
+            logger.info(
+                "Job %s finished with status '%s' (return code: %s)",
+                job.name,
+                result.status,
+                result.rc,
+            )
+            finish(index, result)
+
+    # Jobs that started last added artifacts after the last rotation.
+    for project_name in project_jobs:
+        remove_old_artifacts(project_name, rotate_artifacts, set())
+    return [results[index] for index in range(len(jobs))]
+
+
+def partition_hosts(hosts: List[str], shards: int) -> List[List[str]]:
+    """
+    Split hosts into contiguous groups of nearly equal size.
+
+    Args:
+        hosts (List[str]): The host names, in inventory order.
+        shards (int): Number of groups.
+
+    Returns:
+        List[List[str]]: The host groups. There are fewer groups than
+            'shards' if there are fewer hosts.
+    """
+    shards = max(1, min(shards, len(hosts)))
+    size, remainder = divmod(len(hosts), shards)
+    groups = []
+    start = 0
+    for shard in range(shards):
+        end = start + size + (shard < remainder)
+        groups.append(hosts[start:end])
+        start = end
+    return [group for group in groups if group]
+
+
+@contextmanager
+def host_limit_files(host_groups: List[List[str]]) -> Iterator[List[str]]:
+    """
+    Write host groups to temporary Ansible limit files.
+
+    A limit file keeps long host lists off the command line, which has a
+    length limit. The files are removed when the context exits.
+
+    Args:
+        host_groups (List[List[str]]): The host groups.
+
+    Yields:
+        Iterator[List[str]]: The '@<file>' limit of each host group. The
+            files are named 'shard-<number>', counting from 1.
+    """
+    with tempfile.TemporaryDirectory(prefix=LIMIT_DIR_PREFIX) as limit_dir:
+        limits = []
+        for number, hosts in enumerate(host_groups, start=1):
+            limit_file = Path(limit_dir) / f"shard-{number}"
+            limit_file.write_text("\n".join(hosts) + "\n", config.ENCODING)
+            limits.append(f"@{limit_file}")
+        yield limits
+
+
+def get_shard_group(limit: Optional[str]) -> Optional[str]:
+    """
+    Get the sharded run a host limit belongs to.
+
+    All shards of one run share the limit folder of host_limit_files, so
+    the folder identifies the run.
+
+    Args:
+        limit (Optional[str]): The host limit of a run, see
+            report.read_artifact_limit.
+
+    Returns:
+        Optional[str]: The limit folder, or None if the limit is not a
+            shard limit file.
+    """
+    if not limit or not limit.startswith("@"):
+        return None
+    limit_file = Path(limit[1:])
+    if not (
+        limit_file.parent.name.startswith(LIMIT_DIR_PREFIX)
+        and limit_file.name.startswith("shard-")
+    ):
+        return None
+    return str(limit_file.parent)
+
+
+def run_shards(  # pylint: disable=too-many-arguments
+    project_name: str,
+    playbook_file: str,
+    host_groups: List[List[str]],
+    rotate_artifacts: int,
+    extra_vars_dict: dict[str, str],
+    on_finish: Optional[Callable[[RunJobResult], None]] = None,
+) -> List[RunJobResult]:
+    """
+    Run a playbook as parallel jobs, one per host group.
+
+    Each job is limited to its hosts with a limit file, see
+    host_limit_files, and writes its own artifact. Artifact rotation keeps
+    at least one artifact per group, so the whole run can still be
+    reported on after it ends.
+
+    Args:
+        project_name (str): Project name.
+        playbook_file (str): Playbook filename.
+        host_groups (List[List[str]]): The host groups, see
+            partition_hosts.
+        rotate_artifacts (int): Artifact rotation limit.
+        extra_vars_dict (dict[str, str]): Extra vars.
+        on_finish (Optional[Callable[[RunJobResult], None]], optional):
+            Called with each result as its job ends. Defaults to None.
+
+    Returns:
+        List[RunJobResult]: The job results, in host group order.
+    """
+    with host_limit_files(host_groups) as limits:
+        jobs = [
+            RunJob(
+                project=project_name,
+                playbook=playbook_file,
+                limit=limit,
+                extra_vars=extra_vars_dict,
+            )
+            for limit in limits
+        ]
+        logger.info(
+            "Running '%s' in '%s' shards", playbook_file, len(host_groups)
+        )
+        return run_many(
+            jobs,
+            max_jobs=len(jobs),
+            max_project_jobs=len(jobs),
+            rotate_artifacts=max(rotate_artifacts, len(jobs)),
+            on_finish=on_finish,
+        )
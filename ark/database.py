@@ -1,18 +1,484 @@
 """Ark - Database Session Management."""
 __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
+import atexit
 import logging
+import os
 import sys
-from functools import wraps
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial, wraps
+from inspect import isgeneratorfunction
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.exc import OperationalError
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, create_engine
 
+from ark import migrations
+from ark.instrumentation import query_stats
 from ark.settings import config
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
 logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("ark.slow_query")
+
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+
+_engines: Dict[str, Engine] = {}
+_session_factories: Dict[str, Callable[[], Session]] = {}
+_engine_hooks: List[Callable[[Engine], None]] = []
+_engine_lock = threading.RLock()
+_initialized_db_urls: Set[str] = set()
+_writer_lock = threading.RLock()
+_writer_state = threading.local()
+
+
+def get_sqlite_path(db_url: str) -> Optional[Path]:
+    """
+    Get the database file path of a SQLite database URL.
+
+    Args:
+        db_url (str): The database URL.
+
+    Returns:
+        Optional[Path]: The database file path, or None if the URL is not a
+            SQLite file database.
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() != "sqlite":
+        return None
+    if not url.database or url.database == ":memory:":
+        return None
+    return Path(url.database)
+
+
+def get_engine_options(db_url: str) -> Dict[str, Any]:
+    """
+    Get the engine and pool options for a database URL.
+
+    SQLite file databases use a QueuePool so connections are reused between
+    sessions. In-memory SQLite databases keep the SQLAlchemy defaults.
+
+    Args:
+        db_url (str): The database URL.
+
+    Returns:
+        Dict[str, Any]: Keyword arguments for create_engine.
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        if get_sqlite_path(db_url) is None:
+            return {}
+        return {
+            "poolclass": QueuePool,
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+            "connect_args": {"check_same_thread": False},
+        }
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def apply_engine_hooks(engine: Engine) -> None:
+    """
+    Call all registered engine hooks for an engine.
+
+    Used for engines that are not created through get_engine, such as the
+    sync engine behind an async engine.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    with _engine_lock:
+        for hook in _engine_hooks:
+            hook(engine)
+
+
+def register_engine_hook(hook: Callable[[Engine], None]) -> None:
+    """
+    Register a function to call for every engine in the registry.
+
+    The hook is called for engines that already exist and for every engine
+    created afterwards. Use it to attach SQLAlchemy event listeners.
+
+    Args:
+        hook (Callable[[Engine], None]): Function that receives the engine.
+    """
+    with _engine_lock:
+        _engine_hooks.append(hook)
+        for engine in _engines.values():
+            hook(engine)
+
+
+def get_engine(db_url: Optional[str] = None) -> Engine:
+    """
+    Get the shared engine for a database URL, creating it on first use.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Returns:
+        Engine: The database engine.
+    """
+    db_url = db_url or config.DB_URL
+    engine = _engines.get(db_url)
+    if engine is not None:
+        return engine
+    with _engine_lock:
+        if db_url not in _engines:
+            logger.debug("Creating database engine.")
+            engine = create_engine(db_url, **get_engine_options(db_url))
+            apply_engine_hooks(engine)
+            _engines[db_url] = engine
+            _session_factories[db_url] = partial(Session, bind=engine)
+        return _engines[db_url]
+
+
+def get_session_factory(
+    db_url: Optional[str] = None,
+) -> Callable[[], Session]:
+    """
+    Get the session factory of the shared engine for a database URL.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Returns:
+        Callable[[], Session]: The session factory.
+    """
+    db_url = db_url or config.DB_URL
+    # Hold the registry lock, so a concurrent dispose_engines cannot remove
+    # the factory between creating the engine and reading it.
+    with _engine_lock:
+        get_engine(db_url)
+        return _session_factories[db_url]
+
+
+def dispose_engines(close: bool = True) -> None:
+    """
+    Dispose all engines in the registry and their connection pools.
+
+    Args:
+        close (bool, optional): Close pooled connections. Pass False in a
+            forked child process so the parent's connections are left
+            untouched. Defaults to True.
+    """
+    with _engine_lock:
+        for db_url, engine in _engines.items():
+            logger.debug("Disposing database engine: '%s'", engine.url)
+            if close:
+                engine.dispose()
+            else:
+                # Replace the pool without closing the parent's connections,
+                # like dispose(close=False) on newer SQLAlchemy versions.
+                engine.pool = engine.pool.recreate()
+            _session_factories.pop(db_url, None)
+        _engines.clear()
+
+
+def apply_sqlite_profile(engine: Engine) -> None:
+    """
+    Apply the configured SQLite pragmas to every new connection.
+
+    WAL journaling lets readers run while a writer commits, and the busy
+    timeout makes concurrent writers wait instead of failing with
+    'database is locked'.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    def set_sqlite_pragmas(  # pylint: disable=unused-argument
+        dbapi_connection: Any, connection_record: Any
+    ) -> None:
+        """Set SQLite pragmas on a new connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT}")
+            # Only takes effect before the first table is created.
+            cursor.execute(f"PRAGMA auto_vacuum={config.SQLITE_AUTO_VACUUM}")
+            cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}")
+            cursor.execute(f"PRAGMA temp_store={config.SQLITE_TEMP_STORE}")
+        finally:
+            cursor.close()
+
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+
+class InstrumentedCursor:
+    """
+    DBAPI cursor wrapper that times and counts fetched rows.
+
+    The statement is recorded when the cursor is closed, so its time
+    includes fetching the rows. SQLAlchemy closes the cursor when a result
+    is exhausted or closed.
+    """
+
+    def __init__(
+        self,
+        cursor: Any,
+        dialect_name: str,
+        statement: str,
+        parameters: Any,
+        elapsed: float,
+    ) -> None:
+        self._cursor = cursor
+        self._dialect_name = dialect_name
+        self._statement = statement
+        self._parameters = parameters
+        self._elapsed = elapsed
+        self._rows = 0
+        self._recorded = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def _fetch(self, method: str, *args: Any) -> Any:
+        """Call a fetch method of the cursor and time it."""
+        start_time = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        self._elapsed += time.perf_counter() - start_time
+        if method == "fetchone":
+            self._rows += result is not None
+        else:
+            self._rows += len(result)
+        return result
+
+    def fetchone(self) -> Any:
+        """Fetch the next row."""
+        return self._fetch("fetchone")
+
+    def fetchmany(self, *args: Any) -> Any:
+        """Fetch the next rows."""
+        return self._fetch("fetchmany", *args)
+
+    def fetchall(self) -> Any:
+        """Fetch all remaining rows."""
+        return self._fetch("fetchall")
+
+    def close(self) -> None:
+        """Close the cursor and record the statement."""
+        self._cursor.close()
+        if not self._recorded:
+            self._recorded = True
+            record_statement(
+                self._cursor,
+                self._dialect_name,
+                self._statement,
+                self._parameters,
+                self._elapsed,
+                self._rows,
+            )
+
+
+def record_statement(
+    cursor: Any,
+    dialect_name: str,
+    statement: str,
+    parameters: Any,
+    elapsed: float,
+    rows: int,
+) -> None:
+    """
+    Record an executed statement and log it if it was slow.
+
+    Slow statements are logged to the 'ark.slow_query' logger with their
+    query plan.
+
+    Args:
+        cursor (Any): The DBAPI cursor that ran the statement.
+        dialect_name (str): The database dialect name.
+        statement (str): The SQL statement.
+        parameters (Any): The statement parameters.
+        elapsed (float): Execution and fetch time in seconds.
+        rows (int): Number of rows fetched.
+    """
+    slow = 0 < config.SLOW_QUERY_THRESHOLD <= elapsed
+    if query_stats.enabled:
+        query_stats.add_statement(elapsed, rows, slow)
+    if not slow:
+        return
+    slow_query_logger.info(
+        "Slow query (%.3fs, %s row(s)): %s\nParameters: %s\nPlan:\n%s",
+        elapsed,
+        rows,
+        statement,
+        parameters,
+        explain_statement(cursor, dialect_name, statement, parameters),
+    )
+
+
+def explain_statement(
+    cursor: Any, dialect_name: str, statement: str, parameters: Any
+) -> str:
+    """
+    Get the query plan of a statement.
+
+    Args:
+        cursor (Any): A DBAPI cursor of the connection that ran the statement.
+        dialect_name (str): The database dialect name.
+        statement (str): The SQL statement.
+        parameters (Any): The statement parameters.
+
+    Returns:
+        str: The query plan, one line per plan row.
+    """
+    prefix = EXPLAIN_PREFIXES.get(dialect_name)
+    if prefix is None:
+        return "Not available for this database."
+    try:
+        explain_cursor = cursor.connection.cursor()
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            plan = explain_cursor.fetchall()
+        finally:
+            explain_cursor.close()
+    except Exception as error:  # pylint: disable=broad-except
+        return f"Not available: {error}"
+    return "\n".join(
+        " | ".join(str(column) for column in row) for row in plan
+    )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time and count the statements of an engine.
+
+    Statistics are only collected while query_stats is enabled. Statements
+    slower than config.SLOW_QUERY_THRESHOLD seconds are always logged.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+
+    def start_statement_timer(  # pylint: disable=unused-argument,too-many-arguments
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        """Store the statement start time."""
+        if query_stats.enabled or config.SLOW_QUERY_THRESHOLD > 0:
+            conn.info.setdefault("statement_start", []).append(
+                time.perf_counter()
+            )
+
+    def stop_statement_timer(  # pylint: disable=unused-argument,too-many-arguments
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        """Record the statement, or wrap its cursor to time the fetch."""
+        start_times = conn.info.get("statement_start")
+        if not start_times:
+            return
+        elapsed = time.perf_counter() - start_times.pop()
+        if cursor.description is None or context is None:
+            record_statement(
+                cursor, engine.dialect.name, statement, parameters, elapsed, 0
+            )
+            return
+        context.cursor = InstrumentedCursor(
+            cursor, engine.dialect.name, statement, parameters, elapsed
+        )
+
+    event.listen(engine, "before_cursor_execute", start_statement_timer)
+    event.listen(engine, "after_cursor_execute", stop_statement_timer)
+
+
+register_engine_hook(apply_sqlite_profile)
+register_engine_hook(instrument_engine)
+atexit.register(dispose_engines)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: dispose_engines(close=False))
+
+
+@contextmanager
+def session_scope(db_url: Optional[str] = None) -> Iterator[Session]:
+    """
+    Provide a session from the shared engine for a database URL.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Yields:
+        Iterator[Session]: The database session.
+    """
+    with get_session_factory(db_url)() as session:
+        yield session
+
+
+@contextmanager
+def writer_lock(db_url: Optional[str] = None) -> Iterator[None]:
+    """
+    Serialize database writers.
+
+    When config.DB_SINGLE_WRITER is enabled, writers queue on a lock
+    instead of racing for the SQLite write lock. For SQLite file databases
+    the lock is a file lock next to the database, so writers in other
+    processes, such as concurrent cron imports, wait their turn as well.
+    The lock is reentrant within a thread.
+
+    Args:
+        db_url (Optional[str], optional): The database URL.
+            Defaults to config.DB_URL.
+
+    Yields:
+        Iterator[None]: Nothing. The lock is held inside the context.
+    """
+    db_url = db_url or config.DB_URL
+    if not config.DB_SINGLE_WRITER:
+        yield
+        return
+    with _writer_lock:
+        depth = getattr(_writer_state, "depth", 0)
+        db_path = get_sqlite_path(db_url)
+        if depth or db_path is None or fcntl is None:
+            _writer_state.depth = depth + 1
+            try:
+                yield
+            finally:
+                _writer_state.depth = depth
+            return
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{db_path}.lock", "a", encoding=config.ENCODING) as lock:
+            logger.debug("Waiting for writer lock: '%s.lock'", db_path)
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _writer_state.depth = 1
+            try:
+                yield
+            finally:
+                _writer_state.depth = 0
+                fcntl.flock(lock, fcntl.LOCK_UN)
 
 
 def get_session(func: Callable[..., Any]) -> Callable[..., Any]:
@@ -26,6 +492,27 @@ def get_session(func: Callable[..., Any]) -> Callable[..., Any]:
         Callable[..., Any]: The wrapped function.
     """
 
+    if isgeneratorfunction(func):
+
+        @wraps(func)
+        def generator_session_manager(*args: Any, **kwargs: Any) -> Any:
+            """
+            Keep the database session open until the generator is exhausted.
+
+            Yields:
+                Any: The generator values.
+            """
+            with session_scope() as session:
+                logger.debug(
+                    "Binding '%s.%s' to session: %s",
+                    func.__module__,
+                    func.__name__,
+                    session.bind,
+                )
+                yield from func(*args, session=session, **kwargs)
+
+        return generator_session_manager
+
     @wraps(func)
     def session_manager(*args: Any, **kwargs: Any) -> Any:
         """
@@ -34,8 +521,7 @@ def get_session(func: Callable[..., Any]) -> Callable[..., Any]:
         Returns:
             Any: The function return value.
         """
-        engine = create_engine(config.DB_URL)
-        with Session(engine) as session:
+        with session_scope() as session:
             logger.debug(
                 "Binding '%s.%s' to session: %s",
                 func.__module__,
@@ -47,28 +533,82 @@ def get_session(func: Callable[..., Any]) -> Callable[..., Any]:
     return session_manager
 
 
+def get_write_session(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Create a database session for a function that writes to the database.
+
+    Same as get_session, but the call holds the writer lock.
+
+    Args:
+        func (Callable[..., Any]): The function to wrap.
+
+    Returns:
+        Callable[..., Any]: The wrapped function.
+    """
+    session_func = get_session(func)
+
+    @wraps(func)
+    def write_session_manager(*args: Any, **kwargs: Any) -> Any:
+        """
+        Hold the writer lock while the function runs.
+
+        Returns:
+            Any: The function return value.
+        """
+        with writer_lock():
+            return session_func(*args, **kwargs)
+
+    return write_session_manager
+
+
 def init_db(
     db_url: str = config.DB_URL,
 ) -> None:
     """
     Create the database tables.
 
+    Databases at the latest schema version are detected with a single-row
+    read and left alone. New databases are created at the latest version;
+    older ones get their pending migrations, except those that must be
+    applied with 'ark db upgrade'. Each database is only checked once per
+    process.
+
     Args:
         db_url (str, optional): The database URL. Defaults to config.DB_URL.
     """
+    if db_url in _initialized_db_urls:
+        return
     logger.debug("Initiating database tables.")
     logger.debug("Database URL: '%s'", db_url)
-    if db_url.startswith("sqlite:///"):
+    db_file = get_sqlite_path(db_url)
+    if db_file:
         logger.debug("Using SQLite database.")
-        db_file = Path(db_url.replace("sqlite:///", ""))
         logger.debug("Ensuring parent directory exists: '%s'", db_file.parent)
         db_file.parent.mkdir(parents=True, exist_ok=True)
     try:
-        logger.debug("Creating database engine.")
-        engine = create_engine(db_url)
-        logger.debug("Creating database tables.")
-        SQLModel.metadata.create_all(engine)
+        engine = get_engine(db_url)
+        if migrations.get_schema_version(engine) != migrations.LATEST_VERSION:
+            logger.debug("Checking database schema.")
+            with writer_lock(db_url):
+                migrations.ensure_schema(engine)
     except OperationalError as error:
         logger.critical("Failed to create database tables: '%s'", error)
         sys.exit(1)
+    _initialized_db_urls.add(db_url)
     logger.info("Database ready.")
+
+
+def upgrade_db(
+    db_url: str = config.DB_URL,
+) -> List[migrations.Migration]:
+    """
+    Apply pending schema migrations.
+
+    Args:
+        db_url (str, optional): The database URL. Defaults to config.DB_URL.
+
+    Returns:
+        List[migrations.Migration]: The applied migrations.
+    """
+    with writer_lock(db_url):
+        return migrations.upgrade(get_engine(db_url))
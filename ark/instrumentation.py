@@ -0,0 +1,86 @@
+"""Ark - SQL Query Instrumentation."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import threading
+from typing import Optional
+
+from ark.utils import format_size
+
+
+class QueryStats:
+    """
+    SQL statistics collected while a command runs.
+
+    Statement timing includes fetching the result rows, so it covers the
+    full database time of a query.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.rows = 0
+        self.fact_bytes = 0
+        self.query_time = 0.0
+        self.slowest_time = 0.0
+        self.slow_statements = 0
+
+    def reset(self) -> None:
+        """Clear the collected statistics."""
+        with self._lock:
+            self.statements = 0
+            self.rows = 0
+            self.fact_bytes = 0
+            self.query_time = 0.0
+            self.slowest_time = 0.0
+            self.slow_statements = 0
+
+    def add_statement(self, elapsed: float, rows: int, slow: bool) -> None:
+        """
+        Record an executed statement.
+
+        Args:
+            elapsed (float): Execution and fetch time in seconds.
+            rows (int): Number of rows fetched.
+            slow (bool): The statement exceeded the slow query threshold.
+        """
+        with self._lock:
+            self.statements += 1
+            self.rows += rows
+            self.query_time += elapsed
+            self.slowest_time = max(self.slowest_time, elapsed)
+            self.slow_statements += slow
+
+    def add_fact_bytes(self, size: int) -> None:
+        """
+        Record facts read from the database.
+
+        Args:
+            size (int): Size of the facts JSON in bytes.
+        """
+        with self._lock:
+            self.fact_bytes += size
+
+    def summary(self, elapsed: Optional[float] = None) -> str:
+        """
+        Summarize the collected statistics.
+
+        Args:
+            elapsed (Optional[float], optional): Total command time in
+                seconds, to show the share spent in SQL. Defaults to None.
+
+        Returns:
+            str: One-line summary.
+        """
+        sql_time = f"{self.query_time:.3f}s"
+        if elapsed:
+            sql_time += f" of {elapsed:.3f}s ({self.query_time / elapsed:.0%})"
+        return (
+            f"SQL: {self.statements} statement(s) in {sql_time}, "
+            f"slowest {self.slowest_time:.3f}s, "
+            f"{self.slow_statements} slow, {self.rows} row(s) fetched, "
+            f"{format_size(self.fact_bytes)} of facts"
+        )
+
+
+query_stats = QueryStats()
@@ -72,3 +72,15 @@ def init_logging(
         file_handler.setLevel(valid_file_level)
 
         logger.addHandler(file_handler)
+
+        # Slow SQL statements also get their own log, with query plans.
+        slow_query_handler = RotatingFileHandler(
+            log_path / "slow_queries.log",
+            maxBytes=max_mb,
+            backupCount=backup_count,
+            encoding=config.ENCODING,
+            delay=True,
+        )
+        slow_query_handler.setFormatter(log_formatter)
+        slow_query_handler.setLevel(logging.INFO)
+        logging.getLogger("ark.slow_query").addHandler(slow_query_handler)
@@ -0,0 +1,315 @@
+"""Ark - Database Schema Migrations."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import false, inspect, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlmodel import SQLModel
+
+from ark.models.artifacts import ArtifactIndex
+from ark.models.events import TaskResult
+from ark.models.facts import (
+    FACTS_GIN_INDEX,
+    AnsibleHostFacts,
+    AnsibleHostFactsChange,
+    AnsibleHostFactsHistory,
+)
+from ark.models.schema import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+class Migration(NamedTuple):
+    """Database schema migration."""
+
+    version: int
+    description: str
+    apply: Callable[[Engine], None]
+    # Dialects on which the migration rewrites existing data, so it is only
+    # applied by 'ark db upgrade'. Elsewhere it is applied on startup.
+    manual_dialects: Tuple[str, ...] = ()
+
+
+def create_host_facts_table(engine: Engine) -> None:
+    """Create the host facts table."""
+    AnsibleHostFacts.__table__.create(engine, checkfirst=True)  # type: ignore
+
+
+def create_fact_log_tables(engine: Engine) -> None:
+    """Create the fact change log and fact history tables."""
+    for model in (AnsibleHostFactsChange, AnsibleHostFactsHistory):
+        model.__table__.create(engine, checkfirst=True)  # type: ignore
+
+
+def add_last_seen_column(engine: Engine) -> None:
+    """Add, backfill and index the host facts 'last_seen' column."""
+    table = AnsibleHostFacts.__table__  # type: ignore
+    columns = inspect(engine).get_columns(table.name)
+    if "last_seen" not in {column["name"] for column in columns}:
+        column_type = table.c.last_seen.type.compile(dialect=engine.dialect)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN last_seen {column_type}"
+            )
+    run_batched(
+        engine,
+        table.name,
+        "UPDATE {table} SET last_seen = last_modified "
+        "WHERE last_seen IS NULL AND id >= :start AND id < :end",
+    )
+    for index in table.indexes:
+        if "last_seen" in index.columns:
+            index.create(engine, checkfirst=True)
+
+
+def convert_facts_to_jsonb(engine: Engine) -> None:
+    """
+    Store host facts as GIN-indexed JSONB on PostgreSQL.
+
+    The column type change rewrites the table in a single transaction.
+    Other databases are not changed.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    table = AnsibleHostFacts.__table__  # type: ignore
+    columns = inspect(engine).get_columns(table.name)
+    facts_column = next(
+        column for column in columns if column["name"] == "facts"
+    )
+    if not isinstance(facts_column["type"], JSONB):
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} "
+                "ALTER COLUMN facts TYPE jsonb USING facts::jsonb"
+            )
+    with engine.begin() as connection:
+        connection.execute(FACTS_GIN_INDEX)
+
+
+def create_artifact_index_table(engine: Engine) -> None:
+    """Create the runner artifact index table."""
+    ArtifactIndex.__table__.create(engine, checkfirst=True)  # type: ignore
+
+
+def create_task_result_table(engine: Engine) -> None:
+    """Create the runner task result table."""
+    TaskResult.__table__.create(engine, checkfirst=True)  # type: ignore
+
+
+def add_change_removed_column(engine: Engine) -> None:
+    """Add the fact change log 'removed' column."""
+    table = AnsibleHostFactsChange.__table__  # type: ignore
+    columns = inspect(engine).get_columns(table.name)
+    if "removed" in {column["name"] for column in columns}:
+        return
+    column_type = table.c.removed.type.compile(dialect=engine.dialect)
+    default = false().compile(dialect=engine.dialect)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table.name} ADD COLUMN removed {column_type} "
+            f"NOT NULL DEFAULT {default}"
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create host facts table", create_host_facts_table),
+    Migration(2, "Create fact change log and history", create_fact_log_tables),
+    Migration(3, "Add indexed host last_seen column", add_last_seen_column),
+    Migration(
+        4,
+        "Store host facts as JSONB",
+        convert_facts_to_jsonb,
+        manual_dialects=("postgresql",),
+    ),
+    Migration(5, "Create runner artifact index", create_artifact_index_table),
+    Migration(6, "Create runner task results", create_task_result_table),
+    Migration(7, "Add fact change removed flag", add_change_removed_column),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def run_batched(engine: Engine, table_name: str, statement: str) -> int:
+    """
+    Run a statement over a table in id ranges, one transaction per batch.
+
+    Keeping each transaction small lets readers and other writers get in
+    between batches on large tables.
+
+    Args:
+        engine (Engine): The database engine.
+        table_name (str): Table to process.
+        statement (str): SQL statement with a '{table}' placeholder and
+            ':start' and ':end' id bind parameters.
+
+    Returns:
+        int: Number of rows affected.
+    """
+    with engine.connect() as connection:
+        min_id, max_id = connection.execute(
+            text(f"SELECT min(id), max(id) FROM {table_name}")
+        ).one()
+    if min_id is None:
+        return 0
+
+    affected_rows = 0
+    sql = text(statement.format(table=table_name))
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with engine.begin() as connection:
+            result = connection.execute(
+                sql, {"start": start, "end": start + BATCH_SIZE}
+            )
+            affected_rows += max(result.rowcount, 0)
+    logger.debug("Batched update of '%s': %s rows", table_name, affected_rows)
+    return affected_rows
+
+
+def get_schema_version(engine: Engine) -> Optional[int]:
+    """
+    Get the stored schema version with a single-row read.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        Optional[int]: The schema version, or None if it is not stored.
+    """
+    try:
+        with engine.connect() as connection:
+            version: Optional[int] = connection.execute(
+                select(SchemaVersion.version).where(SchemaVersion.id == 1)
+            ).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+    return version
+
+
+def set_schema_version(engine: Engine, version: int) -> None:
+    """
+    Store the schema version.
+
+    Args:
+        engine (Engine): The database engine.
+        version (int): The schema version.
+    """
+    SchemaVersion.__table__.create(engine, checkfirst=True)  # type: ignore
+    table = SchemaVersion.__table__  # type: ignore
+    with engine.begin() as connection:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.id == 1)
+            .values(version=version, updated=datetime.now())
+        ).rowcount
+        if not updated:
+            connection.execute(
+                table.insert().values(
+                    id=1, version=version, updated=datetime.now()
+                )
+            )
+    logger.info("Database schema version set to: '%s'", version)
+
+
+def ensure_schema(engine: Engine) -> Optional[int]:
+    """
+    Create the schema for a new database and upgrade existing ones.
+
+    New databases get all tables and the latest schema version. Pending
+    migrations of existing databases are applied in order, up to the first
+    one that must be applied manually; see Migration.manual_dialects.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        Optional[int]: The schema version of the database.
+    """
+    version = get_schema_version(engine)
+    if version is None:
+        if not inspect(engine).has_table(
+            AnsibleHostFacts.__tablename__  # type: ignore
+        ):
+            logger.info("Creating database tables.")
+            SQLModel.metadata.create_all(engine)
+            set_schema_version(engine, LATEST_VERSION)
+            return LATEST_VERSION
+        version = 0
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        if engine.dialect.name in migration.manual_dialects:
+            break
+        apply_migration(engine, migration)
+        version = migration.version
+    if version < LATEST_VERSION:
+        logger.warning(
+            "Database schema version %s is older than %s. "
+            "Run 'ark db upgrade' to apply pending migrations.",
+            version,
+            LATEST_VERSION,
+        )
+    elif version > LATEST_VERSION:
+        logger.warning(
+            "Database schema version %s is newer than this version of Ark "
+            "supports (%s).",
+            version,
+            LATEST_VERSION,
+        )
+    return version
+
+
+def get_pending_migrations(engine: Engine) -> List[Migration]:
+    """
+    Get the migrations that have not been applied to a database.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        List[Migration]: Pending migrations in order.
+    """
+    version = get_schema_version(engine) or 0
+    return [
+        migration for migration in MIGRATIONS if migration.version > version
+    ]
+
+
+def apply_migration(engine: Engine, migration: Migration) -> None:
+    """
+    Apply a migration and store its version.
+
+    Args:
+        engine (Engine): The database engine.
+        migration (Migration): The migration.
+    """
+    logger.info(
+        "Applying migration %s: %s", migration.version, migration.description
+    )
+    migration.apply(engine)
+    set_schema_version(engine, migration.version)
+
+
+def upgrade(engine: Engine) -> List[Migration]:
+    """
+    Apply all pending migrations in order.
+
+    The schema version is stored after every migration, so an interrupted
+    upgrade continues where it stopped. Migrations are idempotent.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        List[Migration]: The applied migrations.
+    """
+    pending_migrations = get_pending_migrations(engine)
+    for migration in pending_migrations:
+        apply_migration(engine, migration)
+    # Pick up tables of models that no migration creates explicitly.
+    SQLModel.metadata.create_all(engine)
+    return pending_migrations
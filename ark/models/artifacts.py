@@ -0,0 +1,35 @@
+"""Ark - Ansible Runner Artifact Index."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlmodel import Column, DateTime, Field, Float, Integer, SQLModel, String
+
+
+class ArtifactIndex(SQLModel, table=True):
+    """Parsed Ansible Runner Artifact Model."""
+
+    id: int = Field(default=None, primary_key=True)
+    project: str = Field(
+        sa_column=Column(String(255), nullable=False, index=True)
+    )
+    path: str = Field(sa_column=Column(String, nullable=False, unique=True))
+    mtime: float = Field(sa_column=Column(Float, nullable=False))
+    run_id: str = Field(sa_column=Column(String(255), nullable=False))
+    playbook: Optional[str] = Field(
+        sa_column=Column(String(255), nullable=True)
+    )
+    timestamp: datetime = Field(
+        sa_column=Column(DateTime, nullable=False, index=True)
+    )
+    status: Optional[str] = Field(sa_column=Column(String(32), nullable=True))
+    rc: Optional[int] = Field(sa_column=Column(Integer, nullable=True))
+    host_stats: str = Field(sa_column=Column(String, nullable=False))
+
+    @property
+    def recaps(self) -> List[Dict[str, Dict[str, int]]]:
+        """Per-host stats of every play recap in the artifact."""
+        recaps: List[Dict[str, Dict[str, int]]] = json.loads(self.host_stats)
+        return recaps
@@ -0,0 +1,39 @@
+"""Ark - Ansible Runner Task Results."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import (
+    Boolean,
+    Column,
+    DateTime,
+    Field,
+    Float,
+    Index,
+    SQLModel,
+    String,
+)
+
+
+class TaskResult(SQLModel, table=True):
+    """Result of one task on one host, from a runner event."""
+
+    __table_args__ = (
+        Index("ix_taskresult_project_run_id", "project", "run_id"),
+    )
+
+    id: int = Field(default=None, primary_key=True)
+    project: str = Field(sa_column=Column(String(255), nullable=False))
+    run_id: str = Field(sa_column=Column(String(255), nullable=False))
+    playbook: Optional[str] = Field(
+        sa_column=Column(String(255), nullable=True)
+    )
+    task_uuid: str = Field(sa_column=Column(String(36), nullable=False))
+    task: str = Field(sa_column=Column(String, nullable=False))
+    host: str = Field(sa_column=Column(String(255), nullable=False))
+    start: datetime = Field(sa_column=Column(DateTime, nullable=False))
+    end: datetime = Field(sa_column=Column(DateTime, nullable=False))
+    duration: float = Field(sa_column=Column(Float, nullable=False))
+    result: str = Field(sa_column=Column(String(16), nullable=False))
+    changed: bool = Field(sa_column=Column(Boolean, nullable=False))
@@ -5,7 +5,10 @@ import json
 from datetime import datetime
 from typing import Optional
 
-from sqlmodel import Column, DateTime, Field, SQLModel, String
+from sqlalchemy import DDL, event, false
+from sqlmodel import Boolean, Column, DateTime, Field, SQLModel, String
+
+from ark.models.types import FactsJSON
 
 
 class AnsibleHostFacts(SQLModel, table=True):
@@ -25,10 +28,13 @@ class AnsibleHostFacts(SQLModel, table=True):
     architecture: str = Field(sa_column=Column(String, nullable=True))
     default_ipv4: str = Field(sa_column=Column(String, nullable=True))
     default_ipv6: str = Field(sa_column=Column(String, nullable=True))
-    facts: str = Field(sa_column=Column(String, nullable=False))
+    facts: str = Field(sa_column=Column(FactsJSON, nullable=False))
     last_modified: datetime = Field(
         sa_column=Column(DateTime, nullable=False, default=datetime.now)
     )
+    last_seen: datetime = Field(
+        sa_column=Column(DateTime, nullable=True, index=True)
+    )
 
     @classmethod
     def from_json(
@@ -58,5 +64,76 @@ class AnsibleHostFacts(SQLModel, table=True):
             default_ipv4=facts.get("ansible_default_ipv4", {}).get("address"),
             default_ipv6=facts.get("ansible_default_ipv6", {}).get("address"),
             last_modified=datetime.now(),
+            last_seen=datetime.now(),
             facts=facts_json,
         )
+
+
+# GIN index for server-side fact queries on PostgreSQL.
+FACTS_GIN_INDEX = DDL(
+    "CREATE INDEX IF NOT EXISTS ix_ansiblehostfacts_facts "
+    "ON ansiblehostfacts USING gin (facts)"
+).execute_if(dialect="postgresql")
+event.listen(
+    AnsibleHostFacts.__table__, "after_create", FACTS_GIN_INDEX  # type: ignore
+)
+
+
+class AnsibleHostFactsHistory(SQLModel, table=True):
+    """Ansible Host Facts History Model."""
+
+    id: int = Field(default=None, primary_key=True)
+    fqdn: str = Field(
+        sa_column=Column(String(255), nullable=False, index=True)
+    )
+    facts: str = Field(sa_column=Column(String, nullable=False))
+    last_modified: datetime = Field(
+        sa_column=Column(DateTime, nullable=False)
+    )
+    archived_at: datetime = Field(
+        sa_column=Column(DateTime, nullable=False, default=datetime.now)
+    )
+
+
+class AnsibleHostFactsChange(SQLModel, table=True):
+    """Ansible Host Facts Change Log Model."""
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    sequence: int = Field(default=None, primary_key=True)
+    fqdn: str = Field(
+        sa_column=Column(String(255), nullable=False, index=True)
+    )
+    changed_keys: str = Field(sa_column=Column(String, nullable=False))
+    timestamp: datetime = Field(
+        sa_column=Column(DateTime, nullable=False, default=datetime.now)
+    )
+    removed: bool = Field(
+        default=False,
+        sa_column=Column(
+            Boolean, nullable=False, default=False, server_default=false()
+        ),
+    )
+
+    @classmethod
+    def from_keys(
+        cls, fqdn: str, changed_keys: list[str], removed: bool = False
+    ) -> "AnsibleHostFactsChange":
+        """
+        Create a new AnsibleHostFactsChange object from a list of fact keys.
+
+        Args:
+            fqdn (str): Fully qualified domain name.
+            changed_keys (list[str]): Changed top-level fact keys.
+            removed (bool, optional): The host was removed from the
+                database. Defaults to False.
+
+        Returns:
+            AnsibleHostFactsChange: New AnsibleHostFactsChange object.
+        """
+        return cls(
+            fqdn=fqdn,
+            changed_keys=json.dumps(sorted(changed_keys)),
+            timestamp=datetime.now(),
+            removed=removed,
+        )
@@ -0,0 +1,18 @@
+"""Ark - Database Schema Version."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+from datetime import datetime
+
+from sqlmodel import Column, DateTime, Field, Integer, SQLModel
+
+
+class SchemaVersion(SQLModel, table=True):
+    """Database Schema Version Model."""
+
+    __tablename__ = "ark_schema_version"
+
+    id: int = Field(default=None, primary_key=True)
+    version: int = Field(sa_column=Column(Integer, nullable=False))
+    updated: datetime = Field(
+        sa_column=Column(DateTime, nullable=False, default=datetime.now)
+    )
@@ -0,0 +1,63 @@
+"""Ark - Column Types."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import json
+from typing import Any, Optional, Type, cast
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import String, TypeDecorator, TypeEngine, UserDefinedType
+
+from ark.instrumentation import query_stats
+
+
+class FactsJSON(TypeDecorator[str]):  # pylint: disable=too-many-ancestors
+    """
+    Ansible facts stored as a JSON document.
+
+    Facts are JSON strings in Python on every database. PostgreSQL stores
+    them as JSONB so they can be queried and indexed server-side; other
+    databases store the plain string.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect: Dialect) -> TypeEngine[Any]:
+        """Use JSONB on PostgreSQL."""
+        impl: TypeEngine[Any] = (
+            JSONB() if dialect.name == "postgresql" else String()
+        )
+        # The stubs expect a type class, but dialects adapt instances too.
+        return cast(
+            TypeEngine[Any],
+            dialect.type_descriptor(cast(Type[TypeEngine[Any]], impl)),
+        )
+
+    def process_bind_param(
+        self, value: Optional[Any], dialect: Dialect
+    ) -> Optional[Any]:
+        """Parse JSON strings for JSONB columns."""
+        if dialect.name == "postgresql" and isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def process_result_value(
+        self, value: Optional[Any], dialect: Dialect
+    ) -> Optional[str]:
+        """Return JSONB documents as JSON strings."""
+        if value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+        if value is not None and query_stats.enabled:
+            query_stats.add_fact_bytes(len(value))
+        return value
+
+
+class JSONPath(UserDefinedType[str]):  # pylint: disable=abstract-method
+    """PostgreSQL jsonpath expression."""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw: Any) -> str:
+        """Column type name."""
+        return "JSONPATH"
@@ -0,0 +1,2 @@
+"""Ark - Ansible Cache Plugins Module."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
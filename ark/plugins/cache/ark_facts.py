@@ -0,0 +1,115 @@
+"""Ark - Ansible Fact Cache Plugin."""
+__author__ = "Anthony Pagan <get-tony@outlook.com>"
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable
+
+from ansible.parsing.ajson import AnsibleJSONEncoder
+from ansible.plugins.cache import BaseCacheModule
+from ansible.utils.display import Display
+
+DOCUMENTATION = """
+    name: ark_facts
+    short_description: Store gathered facts in the Ark database.
+    description:
+        - Upserts gathered facts into the Ark facts database with the same
+          merge semantics as 'ark facts import'.
+        - Hosts are looked up by FQDN or hostname.
+        - Deleting or flushing the cache only clears facts held in memory;
+          use 'ark facts remove' or 'ark facts prune' to remove hosts.
+        - Enable it for a project with 'ark facts cache-plugin'.
+    options:
+      _uri:
+        description:
+          - Ark database URL. Defaults to ARK_DB_URL or the Ark default.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+        ini:
+          - key: fact_caching_connection
+            section: defaults
+"""
+
+display = Display()
+
+
+class CacheModule(BaseCacheModule):  # type: ignore
+    """Ark database backed fact cache."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        db_url = self.get_option("_uri")
+        if db_url:
+            os.environ["ARK_DB_URL"] = db_url
+
+        # Ark logging is not configured inside Ansible; keep Ark log
+        # records off the Ansible console.
+        logging.getLogger("ark").addHandler(logging.NullHandler())
+
+        # Imported here so that the connection option is applied to the
+        # Ark settings before they are loaded.
+        # pylint: disable=import-outside-toplevel
+        from ark.core import facts
+        from ark.models.facts import AnsibleHostFacts
+
+        self._facts = facts
+        self._model = AnsibleHostFacts
+        self._cache: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """Get the facts of a host."""
+        if key not in self._cache:
+            host_facts = self._facts.get_host_facts(key)
+            if host_facts is None:
+                # Inventory names are often short hostnames.
+                fqdn = self._facts.get_host_fqdn(key)
+                if fqdn is not None:
+                    host_facts = self._facts.get_host_facts(fqdn)
+            if host_facts is None:
+                raise KeyError(key)
+            self._cache[key] = host_facts
+        return self._cache[key]
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store the facts of a host."""
+        self._cache[key] = value
+        if not value.get("ansible_fqdn"):
+            display.vvv(
+                f"ark_facts: not storing facts without 'ansible_fqdn' for "
+                f"'{key}'."
+            )
+            return
+        self._facts.store_facts(
+            {
+                key: self._model.from_json(
+                    json.dumps(value, cls=AnsibleJSONEncoder)
+                )
+            }
+        )
+
+    def keys(self) -> Iterable[str]:
+        """Get all known hosts."""
+        return {host.fqdn for host in self._facts.get_all_db_hosts()} | set(
+            self._cache
+        )
+
+    def contains(self, key: str) -> bool:
+        """Check if facts are known for a host."""
+        try:
+            self.get(key)
+        except KeyError:
+            return False
+        return True
+
+    def delete(self, key: str) -> None:
+        """Forget the in-memory facts of a host."""
+        self._cache.pop(key, None)
+
+    def flush(self) -> None:
+        """Forget all in-memory facts."""
+        self._cache = {}
+
+    def copy(self) -> Dict[str, Dict[str, Any]]:
+        """Get a copy of all facts."""
+        return {key: self.get(key) for key in self.keys()}
@@ -8,6 +8,7 @@ from pathlib import Path
 
 import dotenv
 from pydantic import BaseSettings, ValidationError, validator
+from pydantic.fields import ModelField
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +62,19 @@ class ARKSettings(BaseSettings):  # pylint: disable=too-few-public-methods
 
     PROJECTS_DIR: str = get_projects_dir()
     DB_URL: str = f"sqlite:///{Path(PROJECTS_DIR) / 'ark.db'}"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_PRE_PING: bool = False
+    DB_SINGLE_WRITER: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT: int = 30000  # Milliseconds
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE: int = -65536  # Negative values are KiB (64 MiB)
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_AUTO_VACUUM: str = "INCREMENTAL"  # Applies to new databases
     CONSOLE_LOG_LEVEL: str = "WARNING"
     FILE_LOG_LEVEL: str = "INFO"
     ENCODING: str = "utf-8"
@@ -68,6 +82,8 @@ class ARKSettings(BaseSettings):  # pylint: disable=too-few-public-methods
     RUN_SCRIPT: str = str(Path(PROJECTS_DIR) / "ark_run_script.sh")
     DNS_SERVERS: str = "8.8.8.8"  # Google DNS
     TABLE_FORMAT: str = "psql"
+    FACT_HISTORY_LIMIT: int = 5
+    SLOW_QUERY_THRESHOLD: float = 1.0  # Seconds, 0 disables the log
 
     class Config:  # pylint: disable=too-few-public-methods
         """Ark settings configuration."""
@@ -86,6 +102,47 @@ class ARKSettings(BaseSettings):  # pylint: disable=too-few-public-methods
             raise ValueError(f"Invalid encoding: {value}") from lookup_error
         return value
 
+    @validator(
+        "SQLITE_JOURNAL_MODE",
+        "SQLITE_SYNCHRONOUS",
+        "SQLITE_TEMP_STORE",
+        "SQLITE_AUTO_VACUUM",
+    )
+    @classmethod
+    def validate_sqlite_pragma(cls, value: str, field: ModelField) -> str:
+        """Validate SQLite pragma values."""
+        allowed_values = {
+            "SQLITE_JOURNAL_MODE": {
+                "DELETE",
+                "TRUNCATE",
+                "PERSIST",
+                "MEMORY",
+                "WAL",
+                "OFF",
+            },
+            "SQLITE_SYNCHRONOUS": {"OFF", "NORMAL", "FULL", "EXTRA"},
+            "SQLITE_TEMP_STORE": {"DEFAULT", "FILE", "MEMORY"},
+            "SQLITE_AUTO_VACUUM": {"NONE", "FULL", "INCREMENTAL"},
+        }[field.name]
+        value = value.strip().upper()
+        if value not in allowed_values:
+            raise ValueError(
+                f"Invalid {field.name}: {value}. "
+                f"Expected one of: {', '.join(sorted(allowed_values))}"
+            )
+        return value
+
+    @validator("SLOW_QUERY_THRESHOLD")
+    @classmethod
+    def validate_slow_query_threshold(cls, value: float) -> float:
+        """Validate the slow query threshold."""
+        if value < 0:
+            raise ValueError(
+                f"Invalid SLOW_QUERY_THRESHOLD: {value}. "
+                "Expected 0 or a positive number of seconds."
+            )
+        return value
+
     @classmethod
     def load_from_env(cls) -> "ARKSettings":
         """Load settings from environment variables."""
@@ -3,6 +3,7 @@ __author__ = "Anthony Pagan <get-tony@outlook.com>"
 
 import logging
 import re
+from datetime import timedelta
 from pathlib import Path
 from typing import Any, List, Optional, Union
 
@@ -40,6 +41,59 @@ def fuzzy_match_strings(base: str, comparator: str) -> bool:
     )
 
 
+def parse_duration(duration: str) -> timedelta:
+    """
+    Parse a duration string.
+
+    Rules:
+        - A duration is a whole number followed by a unit.
+        - Supported units are 's' (seconds), 'm' (minutes), 'h' (hours),
+            'd' (days) and 'w' (weeks).
+
+    Args:
+        duration (str): The duration string. Example: '30d'.
+
+    Raises:
+        ValueError: If the duration string is not valid.
+
+    Returns:
+        timedelta: The parsed duration.
+    """
+    units = {
+        "s": "seconds",
+        "m": "minutes",
+        "h": "hours",
+        "d": "days",
+        "w": "weeks",
+    }
+    match = re.fullmatch(r"(\d+)([smhdw])", duration.strip().lower())
+    if not match:
+        raise ValueError(
+            f"Invalid duration: '{duration}'. Expected a number followed by "
+            "one of: s, m, h, d, w."
+        )
+    return timedelta(**{units[match.group(2)]: int(match.group(1))})
+
+
+def format_size(size: float) -> str:
+    """
+    Format a size in bytes for display.
+
+    Args:
+        size (float): Size in bytes.
+
+    Returns:
+        str: The formatted size. Example: '1.5 MiB'.
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            if unit == "B":
+                return f"{size:.0f} {unit}"
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
 def convert_bool_to_str(data: Any) -> Any:
     """
     Convert boolean values to strings.
@@ -208,6 +262,7 @@ def get_valid_projects() -> list[str]:
     for project in Path(config.PROJECTS_DIR).iterdir():
         if any(
             [
+                not project.is_dir(),
                 project.stem.strip().lower() == "logs",
                 project.stem.startswith("_"),
                 project.stem.startswith("."),